@@ -0,0 +1,451 @@
+"""
+Shared GitHub API helpers for the PR comment manager scripts
+
+Used by manage-pr-comment.py, manage-compliance-comment.py and
+manage-security-comment.py, which import it from their own directory. Workflows
+that copy any of them elsewhere must copy this module alongside it.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+from urllib.parse import parse_qs, urlparse
+
+# Imported on first use by load_requests(), so --help and argument errors
+# don't pay for importing requests and urllib3
+requests = None
+
+# orjson, when installed, decodes large comment listings several times faster
+# than the json module; it is optional and nothing else depends on it
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+logger = logging.getLogger('sgex.comments')
+
+# GitHub's maximum page size for the issue comments endpoint
+COMMENTS_PER_PAGE = 100
+
+
+def load_requests():
+    """
+    Import the requests library on first use.
+
+    Returns:
+        The requests module
+    """
+    global requests
+    if requests is None:
+        try:
+            import requests as requests_module
+        except ImportError:
+            print("Error: requests library not found. Install with: pip install requests", file=sys.stderr)
+            sys.exit(1)
+        requests = requests_module
+    return requests
+
+
+def create_session() -> "requests.Session":
+    """
+    Create an HTTP session for GitHub API calls.
+
+    The session keeps connections to api.github.com alive between calls and
+    retries transient failures (connection errors, timeouts, rate limiting,
+    server and gateway errors) with jittered exponential backoff, waiting as
+    long as Retry-After asks when GitHub sends it. POST is not retried because
+    repeating it could create a duplicate comment.
+
+    Responses are requested compressed with every encoding urllib3 can
+    decode here, which adds Brotli (and zstd) when brotli/zstandard are
+    installed; older requests releases only ever ask for gzip and deflate.
+
+    Returns:
+        Configured requests session
+    """
+    load_requests()
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.request import ACCEPT_ENCODING
+    from urllib3.util.retry import Retry
+
+    retry_options = dict(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({'GET', 'PATCH'}),
+        raise_on_status=False
+    )
+    try:
+        # Up to a second of random jitter, so jobs that hit the same limit
+        # don't retry in lockstep, and no computed sleep over 30 seconds
+        retry = Retry(backoff_jitter=1.0, backoff_max=30, **retry_options)
+    except TypeError:
+        # urllib3 1.x supports neither option
+        retry = Retry(**retry_options)
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=retry)
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = ', '.join(ACCEPT_ENCODING.split(','))
+    session.mount('https://', adapter)
+    return session
+
+
+# Shared by all managers in this process so connections are reused
+_SESSION = None
+
+
+def get_session() -> "requests.Session":
+    """
+    Get the process-wide HTTP session, creating it on first use.
+
+    Returns:
+        Shared requests session
+    """
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = create_session()
+    return _SESSION
+
+
+def close_session() -> None:
+    """Close the process-wide HTTP session's pooled connections, if one was created."""
+    global _SESSION
+    if _SESSION is not None:
+        _SESSION.close()
+        _SESSION = None
+
+
+def configure_logging(verbose: bool = False) -> None:
+    """
+    Send log records to the streams the scripts' output has always used.
+
+    Records are written as bare messages: warnings and errors to stderr,
+    everything else to stdout. Debug diagnostics are shown only when verbose.
+
+    Args:
+        verbose: Also show debug records
+    """
+    stdout_handler = logging.StreamHandler(sys.stdout)
+    stdout_handler.addFilter(lambda record: record.levelno < logging.WARNING)
+    stderr_handler = logging.StreamHandler(sys.stderr)
+    stderr_handler.setLevel(logging.WARNING)
+    logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[stdout_handler, stderr_handler])
+    # Only the scripts' own loggers go down to debug; urllib3's stay quiet
+    logging.getLogger('sgex').setLevel(logging.DEBUG if verbose else logging.INFO)
+
+
+def cache_dir() -> Path:
+    """
+    Directory for caches shared by the scripts run in one workflow job.
+
+    Returns:
+        $RUNNER_TEMP on GitHub Actions runners, else the system temp directory
+    """
+    return Path(os.environ.get('RUNNER_TEMP') or tempfile.gettempdir())
+
+
+def utc_timestamp() -> str:
+    """
+    Format the current UTC time as 'YYYY-MM-DD HH:MM:SS UTC'.
+
+    isoformat() avoids strftime's locale-aware directive parsing; its first
+    19 characters are the date and time without the '+00:00' offset.
+
+    Returns:
+        Current timestamp string
+    """
+    return datetime.now(timezone.utc).isoformat(sep=' ', timespec='seconds')[:19] + ' UTC'
+
+
+# str.translate table for sanitize_string(): deletes control characters except
+# tab, newline and carriage return, and escapes backticks, in a single pass
+_SANITIZE_TRANSLATE = dict.fromkeys([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F])
+_SANITIZE_TRANSLATE[ord('`')] = '\\`'
+
+# Any character _SANITIZE_TRANSLATE would change; most inputs (SHAs, branch and
+# workflow names) contain none and are returned as they are
+_NEEDS_SANITIZE_RE = re.compile(r'[`\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+
+
+@lru_cache(maxsize=256)
+def _sanitize_text(value: str) -> str:
+    """Escape an already length-limited string (memoized: stages repeat the same inputs)."""
+    return value.translate(_SANITIZE_TRANSLATE)
+
+
+def sanitize_string(value: str, max_length: int = 500) -> str:
+    """
+    Sanitize a string to prevent content injection.
+
+    Args:
+        value: String to sanitize
+        max_length: Maximum allowed length
+
+    Returns:
+        Sanitized string safe for inclusion in markdown
+    """
+    if not isinstance(value, str):
+        value = str(value)
+
+    if not _NEEDS_SANITIZE_RE.search(value, 0, max_length):
+        return value[:max_length]
+
+    # Limit length, then remove control characters except newlines and tabs
+    # and escape backticks in user content. Slicing first keeps the memoized
+    # keys short.
+    return _sanitize_text(value[:max_length])
+
+
+class GitHubAPIError(Exception):
+    """Raised when a GitHub API request fails (network error or HTTP error status)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        # HTTP status of the failed response, or None for network errors
+        self.status_code = status_code
+
+
+class CommentManagerBase:
+    """
+    Lists, creates and updates the issue comments of a single pull request.
+
+    Requests are made synchronously: each step needs the previous response
+    (the next page URL, or the comment ID to update), so there is nothing to
+    overlap within a run. The shared session already keeps the TLS connection
+    open between them.
+    """
+
+    def __init__(self, token: str, repo: str, pr_number: int):
+        """
+        Initialize the connection details shared by all comment managers.
+
+        Args:
+            token: GitHub token for authentication
+            repo: Repository in format 'owner/repo'
+            pr_number: Pull request number
+        """
+        self.token = token
+        self.owner, self.repo_name = repo.split('/')
+        self.pr_number = pr_number
+        # Comment found, created or updated by this instance, reused on later
+        # lookups and updates; _comment_missing records a lookup that found none
+        self._existing_comment: Optional[Dict[str, Any]] = None
+        self._comment_missing = False
+        # Page URL -> (ETag, raw JSON text, Link header) for conditional re-fetches,
+        # persisted so later scripts in the same job can revalidate them too
+        self._comment_pages: Dict[str, Tuple[str, str, Dict[str, Any]]] = {}
+        self.page_cache_path = cache_dir() / f"sgex-comment-pages-{self.owner}-{self.repo_name}-{pr_number}.json"
+        self._page_cache_loaded = False
+        # Raw page text -> decoded comments, so a page revalidated with a 304
+        # is not decoded again by a later scan
+        self._decoded_pages: Dict[str, List[Dict[str, Any]]] = {}
+        self.api_base = "https://api.github.com"
+        self.session = get_session()
+        # Sent per request rather than stored on the shared session
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github+json"
+        }
+
+    def close(self) -> None:
+        """
+        Close the pooled connections.
+
+        The session is shared by every manager in the process, so the next
+        manager to be created starts a new one.
+        """
+        close_session()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def sanitize_string(self, value: str, max_length: int = 500) -> str:
+        """
+        Sanitize a string to prevent content injection.
+
+        Args:
+            value: String to sanitize
+            max_length: Maximum allowed length
+
+        Returns:
+            Sanitized string safe for inclusion in markdown
+        """
+        return sanitize_string(value, max_length)
+
+    def load_page_cache(self) -> None:
+        """Load comment pages saved by earlier runs in this job (at most once per instance)."""
+        if self._page_cache_loaded:
+            return
+        self._page_cache_loaded = True
+        try:
+            cached = json_loads(self.page_cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if not isinstance(cached, dict):
+            return
+        for url, entry in cached.items():
+            if (isinstance(entry, list) and len(entry) == 3 and isinstance(entry[1], str)
+                    and url not in self._comment_pages):
+                self._comment_pages[url] = tuple(entry)
+
+    def save_page_cache(self) -> None:
+        """Write the cached comment pages to disk, replacing the file atomically."""
+        tmp_path = self.page_cache_path.with_name(f"{self.page_cache_path.name}.{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(self._comment_pages), encoding='utf-8')
+            os.replace(tmp_path, self.page_cache_path)
+        except OSError as e:
+            logger.warning("Warning: could not save comment page cache: %s", e)
+
+    def fetch_comments_page(self, url: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Fetch one page of PR comments, revalidating previously fetched pages.
+
+        Pages seen before are requested with If-None-Match; GitHub answers an
+        unchanged page with 304 Not Modified (no body, and not counted against
+        the primary rate limit), in which case the cached copy is returned.
+        The ETags and pages are kept on disk, so this also works across the
+        separate script runs of one workflow job.
+
+        Args:
+            url: Full page URL including its query string
+
+        Returns:
+            Tuple of (raw JSON text of the page, parsed Link header); the text
+            is decoded by iter_comments() only when it is needed
+
+        Raises:
+            GitHubAPIError: If the page cannot be fetched
+        """
+        self.load_page_cache()
+        cached = self._comment_pages.get(url)
+        headers = self.headers
+        if cached:
+            headers = {**self.headers, "If-None-Match": cached[0]}
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=30)
+            if response.status_code == 304 and cached:
+                # The ETag only covers the page body; the Link header changes
+                # when comments are added on later pages, so use the fresh one
+                links = response.links if 'Link' in response.headers else cached[2]
+                if links != cached[2]:
+                    self._comment_pages[url] = (cached[0], cached[1], links)
+                    self.save_page_cache()
+                return cached[1], links
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise GitHubAPIError(str(e), getattr(e.response, 'status_code', None)) from e
+
+        text = response.content.decode('utf-8')
+        etag = response.headers.get('ETag')
+        if etag:
+            self._comment_pages[url] = (etag, text, response.links)
+            self.save_page_cache()
+        return text, response.links
+
+    def _page_comments(self, text: str, needle: Optional[str]) -> List[Dict[str, Any]]:
+        """Decode a page's comments (once per page), or skip the page if needle doesn't occur in it."""
+        if needle and needle not in text:
+            return []
+        comments = self._decoded_pages.get(text)
+        if comments is None:
+            comments = self._decoded_pages[text] = json_loads(text)
+        return comments
+
+    def iter_comments(self, newest_first: bool = False, needle: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over all comments on the PR, one page at a time.
+
+        Pages are fetched lazily (100 comments per page, following the Link
+        header), so callers that stop iterating early skip the remaining pages.
+
+        The issue comments endpoint can't sort newest first, so in that mode
+        the first page is used to find rel="last", and pages are then walked
+        backwards via rel="prev", each scanned from its end. That reaches the
+        newest 100 comments in at most two requests, and revalidated pages
+        cost nothing against the rate limit, which a GraphQL query can't do.
+
+        Callers looking for a marker can pass part of it as needle: pages whose
+        raw JSON doesn't contain it are skipped without being decoded. The
+        needle must not contain characters JSON may escape (quotes,
+        backslashes, or the < > & of an HTML comment).
+
+        Args:
+            newest_first: Yield the most recent comments first
+            needle: Only yield comments from pages containing this text
+
+        Yields:
+            Comment dicts in creation order, or reverse creation order
+
+        Raises:
+            GitHubAPIError: If a page cannot be fetched
+        """
+        url = (f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
+               f"?per_page={COMMENTS_PER_PAGE}")
+        first_page, links = self.fetch_comments_page(url)
+
+        if not newest_first:
+            yield from self._page_comments(first_page, needle)
+            url = links.get('next', {}).get('url')
+            while url:
+                text, links = self.fetch_comments_page(url)
+                yield from self._page_comments(text, needle)
+                url = links.get('next', {}).get('url')
+            return
+
+        url = links.get('last', {}).get('url')
+        while url:
+            text, links = self.fetch_comments_page(url)
+            yield from reversed(self._page_comments(text, needle))
+            url = links.get('prev', {}).get('url')
+            # Page 1 has already been fetched
+            if url and parse_qs(urlparse(url).query).get('page') == ['1']:
+                break
+        yield from reversed(self._page_comments(first_page, needle))
+
+    def upsert_comment(self, body: str, existing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Update the existing comment, or create a new one when there is none.
+
+        The returned comment is remembered, so later lookups by this instance
+        don't list the PR comments again.
+
+        Args:
+            body: Full comment body
+            existing: Comment to update, or None to create one
+
+        Returns:
+            The created or updated comment
+
+        Raises:
+            GitHubAPIError: If the request fails
+        """
+        # Serialized here rather than by requests' json=, which escapes every
+        # emoji in the status comments as a 12-byte surrogate pair; the encoded
+        # bytes are also what urllib3 resends if it retries the PATCH
+        payload = json.dumps({"body": body}, ensure_ascii=False).encode('utf-8')
+        headers = {**self.headers, "Content-Type": "application/json"}
+        try:
+            if existing:
+                url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/comments/{existing['id']}"
+                response = self.session.patch(url, headers=headers, data=payload, timeout=30)
+            else:
+                url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
+                response = self.session.post(url, headers=headers, data=payload, timeout=30)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise GitHubAPIError(str(e), getattr(e.response, 'status_code', None)) from e
+
+        self._existing_comment = response.json()
+        self._comment_missing = False
+        return self._existing_comment
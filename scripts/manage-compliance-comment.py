@@ -12,26 +12,28 @@ Usage:
 """
 
 import argparse
+import heapq
 import json
 import os
 import re
 import sys
-from datetime import datetime, timezone
+from operator import itemgetter
 from typing import Dict, Optional, Any
-from urllib.parse import quote
 
-try:
-    import requests
-except ImportError:
-    print("Error: requests library not found. Install with: pip install requests", file=sys.stderr)
-    sys.exit(1)
+from gh_comment_common import CommentManagerBase, GitHubAPIError, utc_timestamp
 
+# Layout count in a nested-layout issue, e.g. "Found 3 layout components - ..."
+_LAYOUT_COUNT_RE = re.compile(r'(\d+)')
 
-class ComplianceCommentManager:
+
+class ComplianceCommentManager(CommentManagerBase):
     """Manages compliance report PR comments with content injection protection."""
     
     # Marker to identify our managed compliance comments
     COMMENT_MARKER = "<!-- sgex-compliance-report-comment -->"
+    # Marker text without the HTML comment delimiters, used to skip comment
+    # pages that can't contain it (see iter_comments)
+    MARKER_NEEDLE = "sgex-compliance-report-comment"
     
     def __init__(self, token: str, repo: str, pr_number: int, commit_sha: str, 
                  workflow_url: str, report_data: Optional[Dict[str, Any]] = None):
@@ -46,39 +48,16 @@ class ComplianceCommentManager:
             workflow_url: URL to the workflow run
             report_data: Optional compliance report data (parsed from JSON)
         """
-        self.token = token
-        self.owner, self.repo_name = repo.split('/')
-        self.pr_number = pr_number
+        super().__init__(token, repo, pr_number)
         self.commit_sha = commit_sha
         self.commit_sha_short = commit_sha[:7] if commit_sha else 'unknown'
         self.workflow_url = workflow_url
+        # Links that depend only on the repo and commit, built once per instance
+        blob_base = f"https://github.com/{self.owner}/{self.repo_name}/blob/{commit_sha}"
+        self.commit_url = f"https://github.com/{self.owner}/{self.repo_name}/commit/{commit_sha}"
+        self.components_url = f"{blob_base}/src/components/"
+        self.docs_url = f"{blob_base}/public/docs/page-framework.md"
         self.report_data = report_data or {}
-        self.api_base = "https://api.github.com"
-        self.headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json",
-            "Content-Type": "application/json"
-        }
-    
-    def sanitize_string(self, value: str, max_length: int = 500) -> str:
-        """
-        Sanitize a string to prevent content injection.
-        
-        Args:
-            value: String to sanitize
-            max_length: Maximum allowed length
-            
-        Returns:
-            Sanitized string safe for inclusion in markdown
-        """
-        if not isinstance(value, str):
-            value = str(value)
-        
-        value = value[:max_length]
-        value = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]', '', value)
-        value = value.replace('`', '\\`')
-        
-        return value
     
     @staticmethod
     def get_layout_count_for_sorting(comp: Dict[str, Any]) -> int:
@@ -95,7 +74,7 @@ class ComplianceCommentManager:
             Layout count as integer, or 0 if parsing fails
         """
         try:
-            match = re.search(r'(\d+)', comp['issues'][0])
+            match = _LAYOUT_COUNT_RE.search(comp['issues'][0])
             return int(match.group(1)) if match else 0
         except (KeyError, IndexError, ValueError, TypeError):
             return 0
@@ -104,27 +83,33 @@ class ComplianceCommentManager:
         """
         Find existing compliance report comment on the PR.
         
+        The result is remembered, so later lookups by this instance don't
+        list comments again.
+        
         Returns:
             Comment dict if found, None otherwise
-        """
-        url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
-        
-        try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            
-            comments = response.json()
-            print(f"Searching {len(comments)} comments for compliance report marker")
-            for comment in comments:
-                if self.COMMENT_MARKER in comment.get('body', ''):
-                    print(f"✅ Found existing compliance comment (ID: {comment['id']})")
-                    return comment
             
-            print("No existing compliance comment found")
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching comments: {e}", file=sys.stderr)
+        Raises:
+            GitHubAPIError: If the comments can't be listed; treating that as
+                            "not found" would post a second report
+        """
+        if self._existing_comment is not None:
+            return self._existing_comment
+        if self._comment_missing:
             return None
+        
+        searched = 0
+        for comment in self.iter_comments(needle=self.MARKER_NEEDLE):
+            searched += 1
+            # The marker is always the start of the report (see build_comment_body)
+            if (comment.get('body') or '').startswith(self.COMMENT_MARKER):
+                print(f"✅ Found existing compliance comment (ID: {comment['id']}) after checking {searched} comments")
+                self._existing_comment = comment
+                return comment
+        
+        print(f"No existing compliance comment found ({searched} comments checked)")
+        self._comment_missing = True
+        return None
     
     def build_comment_body(self) -> str:
         """
@@ -133,7 +118,7 @@ class ComplianceCommentManager:
         Returns:
             Formatted comment body with marker at the very start
         """
-        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+        timestamp = utc_timestamp()
         
         # Extract summary data
         summary = self.report_data.get('summary', {})
@@ -145,6 +130,14 @@ class ComplianceCommentManager:
         non_compliant = summary.get('nonCompliant', 0)
         compliance_pct = summary.get('overallCompliance', 0)
         
+        # Percentage of components in each status for the summary table
+        if total > 0:
+            pct_compliant = round(compliant / total * 100)
+            pct_partial = round(partial / total * 100)
+            pct_non_compliant = round(non_compliant / total * 100)
+        else:
+            pct_compliant = pct_partial = pct_non_compliant = 0
+        
         # Determine status badge color
         if compliance_pct >= 90:
             status_badge = "brightgreen"
@@ -159,14 +152,11 @@ class ComplianceCommentManager:
             status_badge = "orange"
             status_text = "Action Required"
         
-        # Create commit link
-        commit_url = f"https://github.com/{self.owner}/{self.repo_name}/commit/{self.commit_sha}"
-        
         # Build the comment header
-        comment = f"""{self.COMMENT_MARKER}
+        parts = [f"""{self.COMMENT_MARKER}
 ## 🔍 Framework Compliance Report
 
-<a href="{commit_url}"><img src="https://img.shields.io/badge/Commit-{self.commit_sha_short}-blue?style=flat-square&logo=github" alt="Commit"/></a>
+<a href="{self.commit_url}"><img src="https://img.shields.io/badge/Commit-{self.commit_sha_short}-blue?style=flat-square&logo=github" alt="Commit"/></a>
 <a href="{self.workflow_url}"><img src="https://img.shields.io/badge/Workflow-View_Logs-gray?style=flat-square&logo=github-actions" alt="Workflow"/></a>
 <a href="#"><img src="https://img.shields.io/badge/Compliance-{compliance_pct}%25-{status_badge}?style=flat-square" alt="Compliance"/></a>
 
@@ -177,73 +167,93 @@ class ComplianceCommentManager:
 
 | Status | Count | Percentage |
 |--------|-------|------------|
-| 🟢 Compliant | {compliant}/{total} | {round(compliant/total*100) if total > 0 else 0}% |
-| 🟠 Partial | {partial}/{total} | {round(partial/total*100) if total > 0 else 0}% |
-| 🔴 Non-compliant | {non_compliant}/{total} | {round(non_compliant/total*100) if total > 0 else 0}% |
+| 🟢 Compliant | {compliant}/{total} | {pct_compliant}% |
+| 🟠 Partial | {partial}/{total} | {pct_partial}% |
+| 🔴 Non-compliant | {non_compliant}/{total} | {pct_non_compliant}% |
 
-"""
+"""]
 
         # Add issue categories if available
         partial_comps = results.get('partiallyCompliant', [])
         
-        # Group by issue type
-        nested_layouts = [c for c in partial_comps if any('layout components' in i for i in c.get('issues', []))]
-        missing_layout = [c for c in partial_comps if any('Missing PageLayout' in i for i in c.get('issues', []))]
-        custom_headers = [c for c in partial_comps if any('custom header' in i for i in c.get('issues', []))]
+        # Group by issue type in a single pass over the components and their issues
+        nested_layouts = []
+        missing_layout = []
+        custom_headers = []
+        for c in partial_comps:
+            has_nested = has_missing = has_custom = False
+            for issue in c.get('issues', []):
+                has_nested = has_nested or 'layout components' in issue
+                has_missing = has_missing or 'Missing PageLayout' in issue
+                has_custom = has_custom or 'custom header' in issue
+                if has_nested and has_missing and has_custom:
+                    break
+            if has_nested:
+                nested_layouts.append(c)
+            if has_missing:
+                missing_layout.append(c)
+            if has_custom:
+                custom_headers.append(c)
         
         if nested_layouts:
-            comment += f"\n### 📦 Nested Layouts ({len(nested_layouts)} components)\n\n"
-            for comp in sorted(nested_layouts, key=self.get_layout_count_for_sorting, reverse=True)[:5]:
-                layout_count = re.search(r'Found (\d+)', comp['issues'][0])
-                count_str = layout_count.group(1) if layout_count else '?'
-                comp_url = f"https://github.com/{self.owner}/{self.repo_name}/blob/{self.commit_sha}/src/components/{comp['name']}.js"
-                comment += f"- 🟠 [{comp['name']}]({comp_url}) ({count_str} layouts)\n"
+            parts.append(f"\n### 📦 Nested Layouts ({len(nested_layouts)} components)\n\n")
+            # Extract each layout count once; it drives both ordering and display
+            # Only the top five are shown, so select them without sorting the rest
+            top_nested = heapq.nlargest(
+                5,
+                ((self.get_layout_count_for_sorting(c), c) for c in nested_layouts),
+                key=itemgetter(0)
+            )
+            for layout_count, comp in top_nested:
+                count_str = str(layout_count) if layout_count else '?'
+                comp_url = f"{self.components_url}{comp['name']}.js"
+                parts.append(f"- 🟠 [{comp['name']}]({comp_url}) ({count_str} layouts)\n")
             if len(nested_layouts) > 5:
-                comment += f"- ... and {len(nested_layouts) - 5} more\n"
+                parts.append(f"- ... and {len(nested_layouts) - 5} more\n")
         
         if missing_layout:
-            comment += f"\n### 📄 Missing PageLayout ({len(missing_layout)} components)\n\n"
+            parts.append(f"\n### 📄 Missing PageLayout ({len(missing_layout)} components)\n\n")
             for comp in missing_layout[:5]:
-                comp_url = f"https://github.com/{self.owner}/{self.repo_name}/blob/{self.commit_sha}/src/components/{comp['name']}.js"
-                comment += f"- 🟠 [{comp['name']}]({comp_url})\n"
+                comp_url = f"{self.components_url}{comp['name']}.js"
+                parts.append(f"- 🟠 [{comp['name']}]({comp_url})\n")
             if len(missing_layout) > 5:
-                comment += f"- ... and {len(missing_layout) - 5} more\n"
+                parts.append(f"- ... and {len(missing_layout) - 5} more\n")
         
         if custom_headers:
-            comment += f"\n### 🎨 Custom Headers ({len(custom_headers)} components)\n\n"
+            parts.append(f"\n### 🎨 Custom Headers ({len(custom_headers)} components)\n\n")
             for comp in custom_headers:
-                comp_url = f"https://github.com/{self.owner}/{self.repo_name}/blob/{self.commit_sha}/src/components/{comp['name']}.js"
-                comment += f"- 🟠 [{comp['name']}]({comp_url})\n"
+                comp_url = f"{self.components_url}{comp['name']}.js"
+                parts.append(f"- 🟠 [{comp['name']}]({comp_url})\n")
         
         # Add non-compliant section if any
         non_compliant_comps = results.get('nonCompliant', [])
         if non_compliant_comps:
-            comment += f"\n### 🔴 Non-Compliant Components ({len(non_compliant_comps)})\n\n"
-            for comp in non_compliant_comps:
-                comp_url = f"https://github.com/{self.owner}/{self.repo_name}/blob/{self.commit_sha}/src/components/{comp['name']}.js"
-                issues_str = ', '.join(comp.get('issues', []))
-                comment += f"- 🔴 [{comp['name']}]({comp_url}): {issues_str}\n"
+            parts.append(f"\n### 🔴 Non-Compliant Components ({len(non_compliant_comps)})\n\n")
+            parts.extend(
+                f"- 🔴 [{comp['name']}]({self.components_url}{comp['name']}.js): {', '.join(comp.get('issues') or ())}\n"
+                for comp in non_compliant_comps
+            )
         
         # Add footer with next steps
-        comment += "\n---\n\n"
+        parts.append("\n---\n\n")
         
         if non_compliant > 0:
-            comment += "### ❌ Action Required\n\n"
-            comment += "Fix non-compliant components before merging.\n\n"
+            parts.append("### ❌ Action Required\n\n")
+            parts.append("Fix non-compliant components before merging.\n\n")
         elif partial > 0:
-            comment += "### ⚠️ Recommendations\n\n"
-            comment += "Consider addressing partial compliance issues to improve code quality.\n\n"
+            parts.append("### ⚠️ Recommendations\n\n")
+            parts.append("Consider addressing partial compliance issues to improve code quality.\n\n")
         else:
-            comment += "### ✅ All Clear!\n\n"
-            comment += "All components are fully compliant with the framework standards.\n\n"
+            parts.append("### ✅ All Clear!\n\n")
+            parts.append("All components are fully compliant with the framework standards.\n\n")
         
-        comment += "📚 **Resources:**\n"
-        comment += f"- [Page Framework Documentation](https://github.com/{self.owner}/{self.repo_name}/blob/{self.commit_sha}/public/docs/page-framework.md)\n"
-        comment += f"- [View Full Workflow Logs]({self.workflow_url})\n"
+        parts.append("📚 **Resources:**\n")
+        parts.append(f"- [Page Framework Documentation]({self.docs_url})\n")
+        parts.append(f"- [View Full Workflow Logs]({self.workflow_url})\n")
         
-        comment += "\n💡 *This comment is automatically updated when compliance checks run.*\n"
+        parts.append("\n💡 *This comment is automatically updated when compliance checks run.*\n")
         
-        return comment
+        return ''.join(parts)
     
     def update_comment(self) -> bool:
         """
@@ -259,28 +269,14 @@ class ComplianceCommentManager:
             # Build comment body
             comment_body = self.build_comment_body()
             
+            self.upsert_comment(comment_body, existing)
             if existing:
-                # Update existing comment
-                url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/comments/{existing['id']}"
-                payload = {"body": comment_body}
-                
-                response = requests.patch(url, headers=self.headers, json=payload, timeout=30)
-                response.raise_for_status()
-                
                 print(f"✅ Updated PR #{self.pr_number} compliance comment")
-                return True
             else:
-                # Create new comment
-                url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
-                payload = {"body": comment_body}
-                
-                response = requests.post(url, headers=self.headers, json=payload, timeout=30)
-                response.raise_for_status()
-                
                 print(f"✅ Created PR #{self.pr_number} compliance comment")
-                return True
+            return True
                 
-        except requests.exceptions.RequestException as e:
+        except GitHubAPIError as e:
             print(f"❌ Error updating comment: {e}", file=sys.stderr)
             return False
         except Exception as e:
@@ -319,19 +315,21 @@ Examples:
     report_data = {}
     try:
         if args.report_file and os.path.exists(args.report_file):
-            with open(args.report_file, 'r') as f:
+            # Binary mode lets json detect the encoding without a separate text decode
+            with open(args.report_file, 'rb') as f:
                 report_data = json.load(f)
             print(f"Loaded compliance report from {args.report_file}")
-        else:
-            # Try reading from stdin
-            import select
-            if select.select([sys.stdin], [], [], 0.0)[0]:
-                stdin_data = sys.stdin.read()
-                if stdin_data.strip():
-                    report_data = json.loads(stdin_data)
-                    print("Loaded compliance report from stdin")
+        elif not sys.stdin.isatty():
+            # Read piped report data; this blocks until the producer finishes
+            # Parse the raw bytes directly instead of decoding to a str first
+            stdin_data = sys.stdin.buffer.read()
+            if stdin_data.strip():
+                report_data = json.loads(stdin_data)
+                print("Loaded compliance report from stdin")
             else:
                 print("Warning: No report data provided, will create comment with empty data", file=sys.stderr)
+        else:
+            print("Warning: No report data provided, will create comment with empty data", file=sys.stderr)
     except json.JSONDecodeError as e:
         print(f"Error: Invalid JSON data: {e}", file=sys.stderr)
         sys.exit(1)
@@ -340,15 +338,15 @@ Examples:
         sys.exit(1)
     
     # Create manager and update comment
-    manager = ComplianceCommentManager(
+    with ComplianceCommentManager(
         args.token,
         args.repo,
         args.pr,
         args.commit_sha,
         args.workflow_url,
         report_data
-    )
-    success = manager.update_comment()
+    ) as manager:
+        success = manager.update_comment()
     
     sys.exit(0 if success else 1)
 
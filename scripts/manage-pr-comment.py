@@ -9,36 +9,283 @@ protection and sanitization.
 Usage:
     python manage-pr-comment.py --token TOKEN --repo OWNER/REPO --pr PR_NUMBER \
                                 --stage STAGE --data JSON_DATA
+    python manage-pr-comment.py --token TOKEN --repo OWNER/REPO --pr PR_NUMBER \
+                                --batch-file UPDATES_JSON
+    python manage-pr-comment.py --token TOKEN --repo OWNER/REPO --pr PR_NUMBER \
+                                --action-id ACTION_ID --append-only --stage STAGE --data JSON_DATA
+    python manage-pr-comment.py --token TOKEN --repo OWNER/REPO --pr PR_NUMBER \
+                                --action-id ACTION_ID --flush
 """
 
 import argparse
 import json
+import logging
 import os
 import re
 import sys
-from datetime import datetime, timezone
-from typing import Dict, Optional, Any
-from urllib.parse import quote
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union, Any
+
+from gh_comment_common import CommentManagerBase, GitHubAPIError, cache_dir, configure_logging, utc_timestamp
+
+logger = logging.getLogger('sgex.pr-comment')
+
+# Characters stripped from action IDs before they go into the comment marker
+_ACTION_ID_DISALLOWED_RE = re.compile(r'[^a-zA-Z0-9\-_]')
+
+# GitHub Pages URLs accepted by sanitize_url(); github.com links are accepted
+# by a prefix check before this is tried
+_GITHUB_PAGES_URL_RE = re.compile(r'^https://[a-zA-Z0-9\-]+\.github\.io/')
+
+# Approximate line numbers of the "Update PR comment" steps in
+# branch-deployment.yml, and the step names shown for them
+_STEP_LINES = {
+    'started': 125,      # "Update PR comment - Build Started"
+    'setup': 203,        # "Update PR comment - Environment Setup Complete"
+    'building': 222,     # "Update PR comment - Building Application"
+    'deploying': 361,    # "Update PR comment - Deploying to GitHub Pages"
+    'verifying': 673,    # "Update PR comment - Verifying Deployment"
+    'success': 770,      # "Comment on associated PR (Success)"
+    'failure': 784,      # "Comment on associated PR (Failure)"
+    'pages-built': None  # Not in branch-deployment.yml
+}
+_STEP_NAMES = {
+    'started': 'Build Started',
+    'setup': 'Environment Setup Complete',
+    'building': 'Building Application',
+    'deploying': 'Deploying to GitHub Pages',
+    'verifying': 'Verifying Deployment',
+    'success': 'Successfully Deployed',
+    'failure': 'Deployment Failed',
+    'pages-built': 'GitHub Pages Built'
+}
+
+
+@lru_cache(maxsize=32)
+def _workflow_step_link(stage: str, commit_sha: str, repo: str) -> str:
+    """Markdown link to a stage's workflow step (memoized: a run repeats the same arguments)."""
+    line = _STEP_LINES.get(stage)
+    name = _STEP_NAMES.get(stage, stage)
+    
+    if line and commit_sha and commit_sha != 'unknown':
+        # Create permalink to specific line in workflow file at this commit
+        workflow_file = ".github/workflows/branch-deployment.yml"
+        link = f"https://github.com/{repo}/blob/{commit_sha}/{workflow_file}#L{line}"
+        return f"[{name}]({link})"
+    else:
+        return name
+
+
+# Timeline section of an existing comment, found in one pass
+_TIMELINE_RE = re.compile(r'### 📋 Deployment Timeline.*?(?=\n---|💡 \*|\Z)', re.DOTALL)
+
+# Timeline entries are also stored as JSON, [[timestamp, icon, text], ...], in
+# an HTML comment on the line after the marker, so later stages read them back
+# without parsing the rendered markdown. '<' and '>' are escaped in the JSON,
+# so ' -->' can only occur at the end.
+_TIMELINE_DATA_PREFIX = "<!-- sgex-timeline-data:"
+_TIMELINE_DATA_RE = re.compile(r'<!-- sgex-timeline-data:(.*?) -->')
+
+# A rendered timeline entry, for comments written before the JSON block existed
+_TIMELINE_LINE_RE = re.compile(r'- \*\*(.*?)\*\* - (\S+) (.*)')
+
+# [timestamp, icon, text]; timestamp and icon are None for a legacy line that
+# didn't follow the entry format, whose text is then the whole line
+TimelineEntry = List[Optional[str]]
 
-try:
-    import requests
-except ImportError:
-    print("Error: requests library not found. Install with: pip install requests", file=sys.stderr)
-    sys.exit(1)
+# Badge links used in the stage templates; {workflow_url} and {branch_url}
+# are filled by str.format_map along with the rest of the template
+_BUILD_LOGS_BADGE = '<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>'
+_EXPECTED_URL_BADGE = '<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-orange?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Expected Deployment URL"/></a>'
+_PREVIEW_URL_BADGE_ORANGE = '<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-orange?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Preview URL"/></a>'
+_PREVIEW_URL_BADGE_GREEN = '<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-brightgreen?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Open Branch Preview"/></a>'
+_OPEN_PREVIEW_BADGE = '<a href="{branch_url}"><img src="https://img.shields.io/badge/Open_Branch_Preview-brightgreen?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Open Branch Preview"/></a>'
+_ERROR_LOGS_BADGE = '<a href="{workflow_url}"><img src="https://img.shields.io/badge/Error_Logs-red?style=for-the-badge&logo=github&label=📊&labelColor=gray" alt="Error Logs"/></a>'
+_HANDLER_LOGS_BADGE_ORANGE = '<a href="{workflow_url}"><img src="https://img.shields.io/badge/Handler_Logs-orange?style=for-the-badge&logo=github&label=⏳&labelColor=gray" alt="Handler Logs"/></a>'
+_HANDLER_LOGS_BADGE_GREEN = '<a href="{workflow_url}"><img src="https://img.shields.io/badge/Handler_Logs-brightgreen?style=for-the-badge&logo=github&label=✅&labelColor=gray" alt="Handler Logs"/></a>'
 
+# Stage templates shared by several stages
+_QUICK_ACTIONS_BUILD_LOGS = "<h3>🔗 Quick Actions</h3>\n\n" + _BUILD_LOGS_BADGE
+_PREVIEW_ORANGE = "\n" + _EXPECTED_URL_BADGE + " _(will be live after deployment)_"
 
-class PRCommentManager:
+
+@dataclass(frozen=True)
+class StageSpec:
+    """Fixed text of a stage's comment; templates are filled by str.format_map."""
+    status_line: str
+    status_icon: str
+    status_text: str
+    next_step: str
+    actions: str
+    # Appended to the actions when a branch URL is known
+    preview: Optional[str]
+    timeline: str
+    # Extra template fields taken from the stage data:
+    # (field name, data key, default, max length after sanitization)
+    data_fields: Tuple[Tuple[str, str, str, int], ...] = ()
+
+
+_STAGE_TEMPLATES = {
+    'started': StageSpec(
+        "<h2>🚀 Deployment Status: Build Started</h2>",
+        "🟠",
+        "Initializing build process",
+        "**Next:** Installing dependencies and setting up environment",
+        _QUICK_ACTIONS_BUILD_LOGS,
+        _PREVIEW_ORANGE,
+        "🟠 {step_link} - Initializing",
+    ),
+    'setup': StageSpec(
+        "<h2>🚀 Deployment Status: Setting Up Environment</h2>",
+        "🟠",
+        "Installing dependencies and configuring environment",
+        "**Next:** Building React application",
+        _QUICK_ACTIONS_BUILD_LOGS,
+        _PREVIEW_ORANGE,
+        "🟠 {step_link} - In progress",
+    ),
+    'building': StageSpec(
+        "<h2>🚀 Deployment Status: Building Application</h2>",
+        "🟠",
+        "Compiling and bundling application code",
+        "**Next:** Deploying to GitHub Pages",
+        _QUICK_ACTIONS_BUILD_LOGS,
+        _PREVIEW_ORANGE,
+        "🟠 {step_link} - In progress",
+    ),
+    'deploying': StageSpec(
+        "<h2>🚀 Deployment Status: Deploying to GitHub Pages</h2>",
+        "🟠",
+        "Pushing build artifacts to gh-pages branch",
+        "**Next:** Verifying deployment accessibility",
+        _QUICK_ACTIONS_BUILD_LOGS,
+        "\n" + _EXPECTED_URL_BADGE + " _(deploying...)_",
+        "🟠 {step_link} - In progress",
+    ),
+    'verifying': StageSpec(
+        "<h2>🚀 Deployment Status: Verifying Deployment</h2>",
+        "🟠",
+        "Checking deployment accessibility",
+        "**Next:** Deployment complete or failure reported",
+        _QUICK_ACTIONS_BUILD_LOGS,
+        "\n" + _PREVIEW_URL_BADGE_ORANGE + " _(verifying...)_",
+        "🟠 {step_link} - In progress",
+    ),
+    'pages-built': StageSpec(
+        "<h2>🚀 Deployment Status: GitHub Pages Built</h2>",
+        "🟢",
+        "Pages content deployed, site building",
+        "**Status:** Site is live and accessible",
+        "<h3>🔗 Quick Actions</h3>\n\n" + _PREVIEW_URL_BADGE_GREEN + "\n" + _BUILD_LOGS_BADGE,
+        None,
+        "🟢 {step_link} - Complete",
+    ),
+    'success': StageSpec(
+        "<h2>🚀 Deployment Status: Successfully Deployed 🟢</h2>",
+        "🟢",
+        "Live and accessible",
+        "**Status:** Deployment complete - site is ready for testing",
+        "<h3>🌐 Preview URLs</h3>\n\n" + _OPEN_PREVIEW_BADGE + "\n\n" + _QUICK_ACTIONS_BUILD_LOGS,
+        None,
+        "🟢 {step_link} - Site is live",
+    ),
+    'failure': StageSpec(
+        "<h2>🚀 Deployment Status: Failed 🔴</h2>",
+        "🔴",
+        "Deployment failed",
+        "**Action Required:** Fix issues and retry deployment",
+        "<h3>🔗 Quick Actions</h3>\n\n" + _ERROR_LOGS_BADGE + "\n\n**Error:** {error_message}",
+        None,
+        "🔴 {step_link} - Failed: {error_message}",
+        data_fields=(
+            ('error_message', 'error_message', 'Unknown error', 200),
+        ),
+    ),
+    'rate-limit-waiting': StageSpec(
+        "<h2>⏳ Copilot Rate Limit Handler: Waiting 🟡</h2>",
+        "🟡",
+        "Waiting for rate limit to reset",
+        "**Status:** {wait_info}",
+        "<h3>🔗 Quick Actions</h3>\n\n" + _HANDLER_LOGS_BADGE_ORANGE + """
+
+**Info:** Copilot rate limit detected. Automatically waiting and will retry when ready.
+**Remaining time:** {remaining_minutes} minutes""",
+        None,
+        "🟡 Waiting for rate limit - {remaining_minutes} minutes remaining",
+        data_fields=(
+            ('wait_info', 'error_message', 'Waiting for rate limit to reset', 300),
+            ('remaining_minutes', 'remaining_minutes', 'unknown', 10),
+        ),
+    ),
+    'rate-limit-complete': StageSpec(
+        "<h2>✅ Copilot Rate Limit Handler: Complete 🟢</h2>",
+        "🟢",
+        "Wait complete, triggering Copilot retry",
+        "**Status:** Done waiting! Copilot retry command posted.",
+        "<h3>🔗 Quick Actions</h3>\n\n" + _HANDLER_LOGS_BADGE_GREEN + """
+
+**Result:** Rate limit wait completed successfully. Copilot has been triggered to retry.""",
+        None,
+        "🟢 Rate limit handler complete - Copilot retry triggered",
+    ),
+    # The icon and text given here are for a clean report; build_comment_body()
+    # reads the report from disk and downgrades them for warnings or issues
+    'security-check': StageSpec(
+        "<h2>🔒 Security Check Status: {status_title} {status_icon}</h2>",
+        "🟢",
+        "Security checks passed",
+        "**Status:** Security scan completed",
+        """<h3>🔒 Security Report</h3>
+
+{security_comment}
+
+""" + _QUICK_ACTIONS_BUILD_LOGS,
+        None,
+        "{status_icon} Security Check - {status_text}",
+    ),
+}
+
+# How the triggering event is shown in the deployment information; other
+# events are shown by name
+_EVENT_DISPLAY = {
+    'push': '📤 Push',
+    'pull_request': '🔀 Pull Request',
+    'workflow_dispatch': '🎯 Manual Trigger',
+    'workflow_call': '🔗 Workflow Call',
+    'schedule': '⏰ Scheduled',
+}
+
+# Static tail of every deployment status comment, after the timeline
+_FOOTER = "\n\n---\n\n💡 *This comment is automatically updated as the deployment progresses.*\n"
+
+# Fallback (should not be reached due to stage validation)
+_FALLBACK_STAGE = StageSpec(
+    "<h2>🚀 Deployment Status: In Progress</h2>",
+    "🔵",
+    "Processing",
+    "**Status:** Processing deployment",
+    _QUICK_ACTIONS_BUILD_LOGS,
+    None,
+    "🔵 Processing",
+)
+
+
+class PRCommentManager(CommentManagerBase):
     """Manages PR comments with content injection protection."""
     
     # Base marker to identify our managed comments
     COMMENT_MARKER_BASE = "sgex-deployment-status-comment"
     
     # Allowed stages to prevent injection
-    ALLOWED_STAGES = {
+    ALLOWED_STAGES = frozenset({
         'started', 'setup', 'building', 'deploying', 'verifying', 
         'success', 'failure', 'pages-built', 'security-check',
         'rate-limit-waiting', 'rate-limit-complete'
-    }
+    })
+    # Listed in validation errors; joined once, in a stable order
+    _ALLOWED_STAGES_TEXT = ', '.join(sorted(ALLOWED_STAGES))
     
     def __init__(self, token: str, repo: str, pr_number: int, action_id: Optional[str] = None, 
                  commit_sha: Optional[str] = None, workflow_name: Optional[str] = None, 
@@ -58,53 +305,37 @@ class PRCommentManager:
             workflow_name: Name of the workflow (for display in comments)
             event_name: Event that triggered the workflow (e.g., 'push', 'pull_request')
         """
-        self.token = token
-        self.owner, self.repo_name = repo.split('/')
-        self.pr_number = pr_number
+        super().__init__(token, repo, pr_number)
         self.action_id = action_id
         self.commit_sha = commit_sha
         self.workflow_name = workflow_name or "Unknown Workflow"
         self.event_name = event_name or "unknown"
-        self.api_base = "https://api.github.com"
-        self.headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json",
-            "Content-Type": "application/json"
-        }
+        # Event shown in the deployment information; fixed for the instance
+        self.event_display = (_EVENT_DISPLAY.get(self.event_name)
+                              or f'⚙️ {self.event_name.replace("_", " ").title()}')
         
         # Create action-specific marker
         if action_id:
             # Sanitize action_id to prevent injection
-            safe_action_id = re.sub(r'[^a-zA-Z0-9\-_]', '', str(action_id))[:50]
-            self.comment_marker = f"<!-- {self.COMMENT_MARKER_BASE}:{safe_action_id} -->"
+            safe_action_id = _ACTION_ID_DISALLOWED_RE.sub('', str(action_id))[:50]
+            # Marker text without the HTML comment delimiters, used to skip
+            # comment pages that can't contain it (see iter_comments)
+            self.marker_needle = f"{self.COMMENT_MARKER_BASE}:{safe_action_id}"
+            self.comment_marker = f"<!-- {self.marker_needle} -->"
+            # Later stages of the same run read the comment ID from here instead
+            # of listing the PR comments again
+            self.comment_cache_path = (
+                cache_dir() / f"sgex-pr-comment-{self.owner}-{self.repo_name}-{pr_number}-{safe_action_id}.json")
+            # Stages recorded with --append-only, published by the next update
+            self.pending_path = (
+                cache_dir() / f"sgex-pr-pending-{self.owner}-{self.repo_name}-{pr_number}-{safe_action_id}.json")
         else:
-            self.comment_marker = f"<!-- {self.COMMENT_MARKER_BASE} -->"
-    
-    def sanitize_string(self, value: str, max_length: int = 500) -> str:
-        """
-        Sanitize a string to prevent content injection.
-        
-        Args:
-            value: String to sanitize
-            max_length: Maximum allowed length
-            
-        Returns:
-            Sanitized string safe for inclusion in markdown
-        """
-        if not isinstance(value, str):
-            value = str(value)
-        
-        # Limit length
-        value = value[:max_length]
-        
-        # Remove control characters except newlines and tabs
-        value = re.sub(r'[\x00-\x08\x0B-\x0C\x0E-\x1F\x7F]', '', value)
-        
-        # Escape markdown special characters in user content
-        # But preserve intentional formatting
-        value = value.replace('`', '\\`')
-        
-        return value
+            self.marker_needle = self.COMMENT_MARKER_BASE
+            self.comment_marker = f"<!-- {self.marker_needle} -->"
+            self.comment_cache_path = None
+            self.pending_path = None
+        self._cache_loaded = False
+        self._comment_from_cache = False
     
     def sanitize_url(self, url: str) -> str:
         """
@@ -116,14 +347,14 @@ class PRCommentManager:
         Returns:
             Sanitized URL or empty string if invalid
         """
-        if not isinstance(url, str):
-            return ""
-        
         # Only allow https URLs to GitHub and GitHub Pages
-        if not re.match(r'^https://(github\.com/|[a-zA-Z0-9\-]+\.github\.io/)', url):
+        if not isinstance(url, str) or not url:
             return ""
-        
-        return url
+        if url.startswith("https://github.com/"):
+            return url
+        if _GITHUB_PAGES_URL_RE.match(url):
+            return url
+        return ""
     
     def validate_stage(self, stage: str) -> str:
         """
@@ -138,74 +369,217 @@ class PRCommentManager:
         Raises:
             ValueError: If stage is not in allowed list
         """
-        stage = stage.lower().strip()
+        if stage in self.ALLOWED_STAGES:
+            return stage
+        stage = stage.strip().lower()
         if stage not in self.ALLOWED_STAGES:
-            raise ValueError(f"Invalid stage '{stage}'. Allowed: {', '.join(self.ALLOWED_STAGES)}")
+            raise ValueError(f"Invalid stage '{stage}'. Allowed: {self._ALLOWED_STAGES_TEXT}")
         return stage
     
-    def get_existing_comment(self) -> Optional[Dict[str, Any]]:
+    def load_cached_comment(self) -> Optional[Dict[str, Any]]:
         """
-        Find existing managed comment on the PR for this action_id.
+        Load the comment written by an earlier stage of this workflow run.
+        
+        The cached copy becomes this instance's known comment, so the lookup
+        methods return it without listing the PR comments. The cache is read
+        at most once per instance.
         
         Returns:
-            Comment dict if found, None otherwise
+            Cached comment dict ('id' and 'body'), or None if there is none
         """
-        url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
-        
+        if self.comment_cache_path is None or self._cache_loaded:
+            return None
+        self._cache_loaded = True
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
-            
-            comments = response.json()
-            print(f"Searching {len(comments)} comments for marker: {self.comment_marker}")
-            for comment in comments:
-                if self.comment_marker in comment.get('body', ''):
-                    print(f"✅ Found existing comment (ID: {comment['id']}) for action_id")
-                    return comment
-            
-            print(f"No existing comment found for action_id: {self.action_id}")
+            cached = json.loads(self.comment_cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
             return None
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching comments: {e}", file=sys.stderr)
+        if not isinstance(cached, dict) or not isinstance(cached.get('id'), int) or not isinstance(cached.get('body'), str):
             return None
+        
+        logger.debug("Loaded comment ID %s from %s", cached['id'], self.comment_cache_path)
+        self._existing_comment = cached
+        self._comment_from_cache = True
+        return cached
     
-    def check_duplicate_comment_for_commit(self) -> Optional[Dict[str, Any]]:
+    def save_cached_comment(self) -> None:
+        """Write the known comment's ID and body for later stages of this run."""
+        if self.comment_cache_path is None or self._existing_comment is None:
+            return
+        comment = {'id': self._existing_comment['id'], 'body': self._existing_comment.get('body') or ''}
+        try:
+            self.comment_cache_path.write_text(json.dumps(comment), encoding='utf-8')
+        except OSError as e:
+            logger.warning("Warning: could not cache comment ID: %s", e)
+    
+    def forget_cached_comment(self) -> None:
+        """Drop the cached comment, e.g. after it turns out to have been deleted."""
+        if self.comment_cache_path is not None:
+            try:
+                self.comment_cache_path.unlink()
+            except OSError:
+                pass
+        self._existing_comment = None
+        self._comment_from_cache = False
+    
+    def load_pending_stages(self) -> List[Dict[str, Any]]:
         """
-        Check if a comment already exists for the same commit SHA from a different workflow run.
-        This helps prevent duplicate comments when multiple workflows trigger for the same commit.
+        Load the stages recorded with append_pending_stage() and not yet published.
         
         Returns:
-            Comment dict if found, None otherwise
+            List of {'stage', 'data', 'entry'} records, oldest first
         """
-        if not self.commit_sha or self.commit_sha == 'unknown':
-            return None
-            
-        url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
+        if self.pending_path is None:
+            return []
+        try:
+            pending = json.loads(self.pending_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return []
+        if not isinstance(pending, list):
+            return []
+        return [p for p in pending
+                if isinstance(p, dict) and isinstance(p.get('stage'), str) and isinstance(p.get('data'), dict)
+                and isinstance(p.get('entry'), list) and len(p['entry']) == 3
+                and all(isinstance(v, str) for v in p['entry'])]
+    
+    def append_pending_stage(self, stage: str, data: Dict[str, Any]) -> bool:
+        """
+        Record a stage for the next update of this run without contacting GitHub.
+        
+        The timeline entry is stamped now, so the comment shows when the stage
+        actually happened once it is published.
         
+        Args:
+            stage: Current workflow stage
+            data: Stage-specific data
+            
+        Returns:
+            True if successful, False otherwise
+        """
         try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
+            stage = self.validate_stage(stage)
+            if self.pending_path is None:
+                raise ValueError("Recording a stage for later requires an action ID")
+            pending = self.load_pending_stages()
+            pending.append({'stage': stage, 'data': data, 'entry': self.timeline_entry(stage, data)})
+            tmp_path = self.pending_path.with_name(self.pending_path.name + '.tmp')
+            tmp_path.write_text(json.dumps(pending, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, self.pending_path)
+        except (OSError, ValueError) as e:
+            logger.error("❌ Error recording stage: %s", e)
+            return False
+        logger.info("📝 Recorded PR #%s stage %s for the next update", self.pr_number, stage)
+        return True
+    
+    def clear_pending_stages(self) -> None:
+        """Drop the recorded stages once they have been published."""
+        if self.pending_path is not None:
+            try:
+                self.pending_path.unlink()
+            except OSError:
+                pass
+    
+    def get_existing_comment(self) -> Optional[Dict[str, Any]]:
+        """
+        Find existing managed comment on the PR for this action_id.
+        
+        Comments are searched newest first, since the managed comment for a
+        workflow run is usually recent, and fetching stops as soon as the
+        marker is found. The result is remembered, so later lookups by this
+        instance don't list comments again.
+        
+        Returns:
+            Comment dict if found, None otherwise
             
-            comments = response.json()
-            print(f"Checking for duplicate comments for commit: {self.commit_sha[:7]}")
+        Raises:
+            GitHubAPIError: If the comments can't be listed; treating that as
+                            "not found" would post a second comment
+        """
+        if self._existing_comment is not None:
+            logger.debug("Reusing known comment (ID: %s) for action_id", self._existing_comment['id'])
+            return self._existing_comment
+        if self._comment_missing:
+            return None
+        
+        logger.debug("Searching comments for marker: %s", self.comment_marker)
+        searched = 0
+        for comment in self.iter_comments(newest_first=True, needle=self.marker_needle):
+            searched += 1
+            # build_comment_body() puts the marker first, so only the start of
+            # each body needs comparing
+            if (comment.get('body') or '').startswith(self.comment_marker):
+                logger.info("✅ Found existing comment (ID: %s) for action_id after checking %d comments", comment['id'], searched)
+                self._existing_comment = comment
+                return comment
+        
+        logger.info("No existing comment found for action_id: %s (%d comments checked)", self.action_id, searched)
+        self._comment_missing = True
+        return None
+    
+    def is_duplicate_for_commit(self, body: str) -> bool:
+        """
+        Check whether a comment body is an sgex deployment comment for this commit.
+        
+        Args:
+            body: Comment body (assumed not to carry this action's marker)
             
-            # Look for any sgex deployment comment for this commit
-            for comment in comments:
-                body = comment.get('body', '')
-                # Check if this is a deployment comment (has our base marker)
-                if self.COMMENT_MARKER_BASE in body:
-                    # Check if it mentions this commit SHA
-                    if self.commit_sha[:7] in body or self.commit_sha in body:
-                        # Don't count our own comment as a duplicate
-                        if self.comment_marker not in body:
-                            print(f"⚠️  Found duplicate comment (ID: {comment['id']}) for commit {self.commit_sha[:7]}")
-                            return comment
+        Returns:
+            True if the body has the base marker and mentions the commit SHA
+        """
+        # Check if this is a deployment comment (has our base marker)
+        if self.COMMENT_MARKER_BASE not in body:
+            return False
+        # Check if it mentions this commit SHA; the full SHA starts with the
+        # short one, so a single scan covers both
+        return self.commit_sha[:7] in body
+    
+    def find_existing_and_duplicate_comment(self) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Find this action's comment and any duplicate for the commit in one listing.
+        
+        Equivalent to get_existing_comment() followed, when nothing is found, by
+        a search for another run's comment on the same commit (see
+        is_duplicate_for_commit()), but walks the comment pages once. Used on
+        the first stage, where the comment usually doesn't exist yet.
+        
+        Returns:
+            Tuple of (existing comment, duplicate comment); the duplicate is only
+            looked for when no existing comment is found
             
-            print(f"No duplicate comment found for commit: {self.commit_sha[:7]}")
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"Error checking for duplicate comments: {e}", file=sys.stderr)
-            return None
+        Raises:
+            GitHubAPIError: If the comments can't be listed
+        """
+        if self._existing_comment is not None:
+            return self.get_existing_comment(), None
+        
+        check_duplicates = bool(self.commit_sha) and self.commit_sha != 'unknown'
+        duplicate = None
+        
+        logger.debug("Searching comments for marker: %s", self.comment_marker)
+        if check_duplicates:
+            logger.debug("Checking for duplicate comments for commit: %s", self.commit_sha[:7])
+        
+        searched = 0
+        for comment in self.iter_comments(newest_first=True, needle=self.COMMENT_MARKER_BASE):
+            searched += 1
+            body = comment.get('body') or ''
+            # Both markers contain the base marker; most comments (reviews, bots)
+            # don't, and are passed over after this one scan
+            if self.COMMENT_MARKER_BASE not in body:
+                continue
+            if body.startswith(self.comment_marker):
+                logger.info("✅ Found existing comment (ID: %s) for action_id after checking %d comments", comment['id'], searched)
+                self._existing_comment = comment
+                return comment, None
+            if check_duplicates and duplicate is None and self.is_duplicate_for_commit(body):
+                logger.info("⚠️  Found duplicate comment (ID: %s) for commit %s", comment['id'], self.commit_sha[:7])
+                duplicate = comment
+        
+        logger.info("No existing comment found for action_id: %s (%d comments checked)", self.action_id, searched)
+        self._comment_missing = True
+        if check_duplicates and duplicate is None:
+            logger.debug("No duplicate comment found for commit: %s", self.commit_sha[:7])
+        return None, duplicate
     
     def extract_timeline_from_comment(self, comment_body: str) -> str:
         """
@@ -217,52 +591,78 @@ class PRCommentManager:
         Returns:
             Timeline section or empty string if not found
         """
-        # Look for the timeline section between markers
-        timeline_start = comment_body.find('### 📋 Deployment Timeline')
-        if timeline_start == -1:
-            return ""
-        
-        # Find the end of the timeline section (the next --- after timeline header, but skip the line itself)
         # Timeline structure:
         # ### 📋 Deployment Timeline
         # 
         # - entry 1
         # - entry 2
         # ---
-        # So we look for \n--- or start of next section
-        search_start = timeline_start + len('### 📋 Deployment Timeline')
+        # The section ends at the next \n--- or the footer, or else runs to the end
+        match = _TIMELINE_RE.search(comment_body)
+        return match.group(0).strip() if match else ""
+    
+    def parse_timeline_markdown(self, timeline: str) -> List[TimelineEntry]:
+        """
+        Parse the entries of a rendered timeline section.
         
-        # Look for the closing --- that comes after the timeline entries
-        timeline_end = comment_body.find('\n---', search_start)
-        if timeline_end == -1:
-            # Try to find the final marker
-            timeline_end = comment_body.find('💡 *', search_start)
+        Args:
+            timeline: Timeline section as returned by extract_timeline_from_comment()
+            
+        Returns:
+            Timeline entries, oldest first
+        """
+        entries = []
+        for line in timeline.split('\n'):
+            if not line.strip().startswith('-'):
+                continue
+            match = _TIMELINE_LINE_RE.fullmatch(line)
+            entries.append(list(match.groups()) if match else [None, None, line])
+        return entries
+    
+    def extract_timeline_entries(self, comment_body: str) -> List[TimelineEntry]:
+        """
+        Read the timeline entries of an existing comment.
         
-        if timeline_end == -1:
-            # No clear end, take the rest
-            return comment_body[timeline_start:]
+        Uses the JSON timeline block when present, and falls back to parsing
+        the rendered timeline of comments written before it was added.
         
-        return comment_body[timeline_start:timeline_end].strip()
+        Args:
+            comment_body: Existing comment body
+            
+        Returns:
+            Timeline entries, oldest first (empty if there is no timeline)
+        """
+        match = _TIMELINE_DATA_RE.search(comment_body)
+        if match:
+            try:
+                entries = json.loads(match.group(1))
+            except ValueError:
+                entries = None
+            if isinstance(entries, list) and all(
+                    isinstance(e, list) and len(e) == 3 and all(v is None or isinstance(v, str) for v in e)
+                    for e in entries):
+                return entries
+        return self.parse_timeline_markdown(self.extract_timeline_from_comment(comment_body))
     
-    def update_timeline_status(self, existing_timeline: str, current_stage: str) -> str:
+    def update_timeline_status(self, entries: List[TimelineEntry], current_stage: str) -> List[TimelineEntry]:
         """
         Update previous in-progress (🟠) steps to completed (🟢) when advancing to a new step.
         
         Args:
-            existing_timeline: Previous timeline entries
+            entries: Previous timeline entries
             current_stage: Current stage being executed
             
         Returns:
-            Updated timeline with previous in-progress steps marked as completed
+            Updated entries with previous in-progress steps marked as completed
         """
-        if not existing_timeline:
-            return ""
-        
-        # Replace all in-progress orange circles with completed green circles for previous steps
-        # This happens when we advance to a new stage
-        updated_timeline = existing_timeline.replace(" - 🟠 ", " - 🟢 ")
-        
-        return updated_timeline
+        updated = []
+        for timestamp, icon, text in entries:
+            if timestamp is None:
+                text = text.replace(" - 🟠 ", " - 🟢 ")
+            elif icon == "🟠":
+                icon = "🟢"
+            updated.append([timestamp, icon, text])
+        return updated
     
     def get_workflow_step_link(self, stage: str, commit_sha: str, repo: str) -> str:
         """
@@ -276,42 +676,83 @@ class PRCommentManager:
         Returns:
             Markdown link to the workflow step
         """
-        # Map stages to their approximate line numbers in branch-deployment.yml
-        # These are the "Update PR comment" step names in the workflow
-        stage_to_line = {
-            'started': 125,      # "Update PR comment - Build Started"
-            'setup': 203,        # "Update PR comment - Environment Setup Complete"
-            'building': 222,     # "Update PR comment - Building Application"
-            'deploying': 361,    # "Update PR comment - Deploying to GitHub Pages"
-            'verifying': 673,    # "Update PR comment - Verifying Deployment"
-            'success': 770,      # "Comment on associated PR (Success)"
-            'failure': 784,      # "Comment on associated PR (Failure)"
-            'pages-built': None  # Not in branch-deployment.yml
-        }
+        return _workflow_step_link(stage, commit_sha, repo)
+    
+    def stage_fields(self, stage: str, data: Dict[str, Any], workflow_url: str, branch_url: str,
+                     step_link: str) -> Tuple[StageSpec, Dict[str, str]]:
+        """
+        Look up the stage template and the values it is formatted with.
+        
+        Args:
+            stage: Current stage of the workflow
+            data: Stage-specific data (will be sanitized)
+            workflow_url: Sanitized workflow run URL
+            branch_url: Sanitized branch preview URL
+            step_link: Link to the workflow step, see get_workflow_step_link()
+            
+        Returns:
+            Tuple of (stage template, format fields including the status)
+        """
+        spec = _STAGE_TEMPLATES.get(stage, _FALLBACK_STAGE)
+        status_icon = spec.status_icon
+        status_text = spec.status_text
         
-        stage_to_name = {
-            'started': 'Build Started',
-            'setup': 'Environment Setup Complete',
-            'building': 'Building Application',
-            'deploying': 'Deploying to GitHub Pages',
-            'verifying': 'Verifying Deployment',
-            'success': 'Successfully Deployed',
-            'failure': 'Deployment Failed',
-            'pages-built': 'GitHub Pages Built'
+        fields = {
+            'workflow_url': workflow_url,
+            'branch_url': branch_url,
+            'step_link': step_link,
         }
+        for field, key, default, max_length in spec.data_fields:
+            fields[field] = self.sanitize_string(data.get(key, default), max_length=max_length)
         
-        line = stage_to_line.get(stage)
-        name = stage_to_name.get(stage, stage)
+        if stage == 'security-check':
+            # Security check stage - read the security comment from file
+            security_comment_path = data.get('security_comment_path', 'security-comment.md')
+            try:
+                security_comment = Path(security_comment_path).read_text(encoding='utf-8', errors='replace')
+            except FileNotFoundError:
+                security_comment = "Security check results not available"
+            except Exception as e:
+                security_comment = f"Error reading security check results: {str(e)}"
+            
+            # Extract summary from security comment
+            if "ISSUES FOUND" in security_comment or "ACTION REQUIRED" in security_comment:
+                status_icon = "🔴"
+                status_text = "Security issues detected"
+            elif "WARNINGS" in security_comment:
+                status_icon = "🟡"
+                status_text = "Security warnings"
+            
+            # Include the full security report in the actions section
+            fields['security_comment'] = security_comment
         
-        if line and commit_sha and commit_sha != 'unknown':
-            # Create permalink to specific line in workflow file at this commit
-            workflow_file = ".github/workflows/branch-deployment.yml"
-            link = f"https://github.com/{repo}/blob/{commit_sha}/{workflow_file}#L{line}"
-            return f"[{name}]({link})"
-        else:
-            return name
+        fields['status_icon'] = status_icon
+        fields['status_text'] = status_text
+        fields['status_title'] = status_text.title()
+        return spec, fields
     
-    def build_comment_body(self, stage: str, data: Dict[str, Any], existing_timeline: str = "") -> str:
+    def timeline_entry(self, stage: str, data: Dict[str, Any]) -> TimelineEntry:
+        """
+        Build the timeline entry a stage update adds, stamped with the current time.
+        
+        Args:
+            stage: Current stage of the workflow
+            data: Stage-specific data (will be sanitized)
+            
+        Returns:
+            Timeline entry [timestamp, icon, text]
+        """
+        commit_sha = self.sanitize_string(data.get('commit_sha', 'unknown'), max_length=40)
+        step_link = self.get_workflow_step_link(stage, commit_sha, f"{self.owner}/{self.repo_name}")
+        spec, fields = self.stage_fields(stage, data, self.sanitize_url(data.get('workflow_url', '')),
+                                         self.sanitize_url(data.get('branch_url', '')), step_link)
+        icon, _, text = spec.timeline.format_map(fields).partition(' ')
+        return [utc_timestamp(), icon, text]
+    
+    def build_comment_body(self, stage: str, data: Dict[str, Any],
+                           existing_timeline: Union[str, List[TimelineEntry]] = "",
+                           pending: Sequence[TimelineEntry] = (),
+                           timestamp: Optional[str] = None) -> str:
         """
         Build the comment body for the given stage, appending to timeline.
         
@@ -321,7 +762,12 @@ class PRCommentManager:
         Args:
             stage: Current stage of the workflow
             data: Stage-specific data (will be sanitized)
-            existing_timeline: Previous timeline entries to append to
+            existing_timeline: Previous timeline entries to append to, as returned
+                               by extract_timeline_entries() or as a rendered
+                               timeline section
+            pending: Entries of earlier stages recorded with --append-only,
+                     added after the existing timeline
+            timestamp: Time of this stage, if it was recorded earlier
             
         Returns:
             Formatted comment body with marker at the very start
@@ -331,6 +777,10 @@ class PRCommentManager:
         commit_sha_short = commit_sha[:7]
         branch_name = self.sanitize_string(data.get('branch_name', 'unknown'), max_length=100)
         commit_url = self.sanitize_url(data.get('commit_url', ''))
+        # History view of the same commit; only the last '/commit/' is the
+        # route, an owner or repository may be called 'commit' too
+        head, sep, sha_part = commit_url.rpartition('/commit/')
+        commits_url = f"{head}/commits/{sha_part}" if sep else commit_url
         workflow_url = self.sanitize_url(data.get('workflow_url', ''))
         branch_url = self.sanitize_url(data.get('branch_url', ''))
         
@@ -338,261 +788,70 @@ class PRCommentManager:
         action_id_display = self.action_id if self.action_id else 'N/A'
         
         # Update existing timeline: change previous in-progress steps to completed
-        if existing_timeline:
-            existing_timeline = self.update_timeline_status(existing_timeline, stage)
+        if isinstance(existing_timeline, str):
+            existing_timeline = self.parse_timeline_markdown(existing_timeline)
+        timeline = self.update_timeline_status([*existing_timeline, *pending], stage)
         
-        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+        timestamp = timestamp or utc_timestamp()
         
         # Get workflow step link
         repo = f"{self.owner}/{self.repo_name}"
         step_link = self.get_workflow_step_link(stage, commit_sha, repo)
         
-        # Determine workflow display info
-        event_display = {
-            'push': '📤 Push',
-            'pull_request': '🔀 Pull Request',
-            'workflow_dispatch': '🎯 Manual Trigger',
-            'workflow_call': '🔗 Workflow Call',
-            'schedule': '⏰ Scheduled'
-        }.get(self.event_name, f'⚙️ {self.event_name.replace("_", " ").title()}')
-        
         # Build preamble with action ID and commit ID links
         preamble = f"""<h3>📊 Deployment Information</h3>
 
-**Workflow:** {self.workflow_name} ({event_display})  
+**Workflow:** {self.workflow_name} ({self.event_display})  
 **Action ID:** [{action_id_display}]({workflow_url})  
-**Commit:** [`{commit_sha_short}`]({commit_url}) ([view changes]({commit_url.replace('/commit/', '/commits/')}))  
+**Commit:** [`{commit_sha_short}`]({commit_url}) ([view changes]({commits_url}))  
 **Workflow Step:** {step_link}
 """
         
         # Stage-specific content with HTML headers for consistent styling
-        if stage == 'started':
-            status_line = "<h2>🚀 Deployment Status: Build Started</h2>"
-            status_icon = "🟠"
-            status_text = "Initializing build process"
-            next_step = "**Next:** Installing dependencies and setting up environment"
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            if branch_url:
-                actions += f"""
-<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-orange?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Expected Deployment URL"/></a> _(will be live after deployment)_"""
-            timeline_entry = f"- **{timestamp}** - 🟠 {step_link} - Initializing"
-        
-        elif stage == 'setup':
-            status_line = "<h2>🚀 Deployment Status: Setting Up Environment</h2>"
-            status_icon = "🟠"
-            status_text = "Installing dependencies and configuring environment"
-            next_step = "**Next:** Building React application"
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            if branch_url:
-                actions += f"""
-<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-orange?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Expected Deployment URL"/></a> _(will be live after deployment)_"""
-            timeline_entry = f"- **{timestamp}** - 🟠 {step_link} - In progress"
-        
-        elif stage == 'building':
-            status_line = "<h2>🚀 Deployment Status: Building Application</h2>"
-            status_icon = "🟠"
-            status_text = "Compiling and bundling application code"
-            next_step = "**Next:** Deploying to GitHub Pages"
-            
-            # Build actions with styled buttons
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            
-            # Add preview URL if available (determined after PUBLIC_URL calculation)
-            if branch_url:
-                actions += f"""
-<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-orange?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Expected Deployment URL"/></a> _(will be live after deployment)_"""
-            
-            timeline_entry = f"- **{timestamp}** - 🟠 {step_link} - In progress"
-        
-        elif stage == 'deploying':
-            status_line = "<h2>🚀 Deployment Status: Deploying to GitHub Pages</h2>"
-            status_icon = "🟠"
-            status_text = "Pushing build artifacts to gh-pages branch"
-            next_step = "**Next:** Verifying deployment accessibility"
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            if branch_url:
-                actions += f"""
-<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-orange?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Expected Deployment URL"/></a> _(deploying...)_"""
-            timeline_entry = f"- **{timestamp}** - 🟠 {step_link} - In progress"
-        
-        elif stage == 'verifying':
-            status_line = "<h2>🚀 Deployment Status: Verifying Deployment</h2>"
-            status_icon = "🟠"
-            status_text = "Checking deployment accessibility"
-            next_step = "**Next:** Deployment complete or failure reported"
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            if branch_url:
-                actions += f"""
-<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-orange?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Preview URL"/></a> _(verifying...)_"""
-            timeline_entry = f"- **{timestamp}** - 🟠 {step_link} - In progress"
-        
-        elif stage == 'pages-built':
-            status_line = "<h2>🚀 Deployment Status: GitHub Pages Built</h2>"
-            status_icon = "🟢"
-            status_text = "Pages content deployed, site building"
-            next_step = "**Status:** Site is live and accessible"
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{branch_url}"><img src="https://img.shields.io/badge/Preview_URL-brightgreen?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Open Branch Preview"/></a>
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            timeline_entry = f"- **{timestamp}** - 🟢 {step_link} - Complete"
-        
-        elif stage == 'security-check':
-            # Security check stage - read the security comment from file
-            security_comment_path = data.get('security_comment_path', 'security-comment.md')
-            security_comment = ""
-            
-            try:
-                import os
-                if os.path.exists(security_comment_path):
-                    with open(security_comment_path, 'r') as f:
-                        security_comment = f.read()
-                else:
-                    security_comment = "Security check results not available"
-            except Exception as e:
-                security_comment = f"Error reading security check results: {str(e)}"
-            
-            # Extract summary from security comment
-            status_icon = "🟢"
-            status_text = "Security checks passed"
-            if "ISSUES FOUND" in security_comment or "ACTION REQUIRED" in security_comment:
-                status_icon = "🔴"
-                status_text = "Security issues detected"
-            elif "WARNINGS" in security_comment:
-                status_icon = "🟡"
-                status_text = "Security warnings"
-            
-            status_line = f"<h2>🔒 Security Check Status: {status_text.title()} {status_icon}</h2>"
-            next_step = f"**Status:** Security scan completed"
-            
-            # Include the full security report in the actions section
-            actions = f"""<h3>🔒 Security Report</h3>
-
-{security_comment}
-
-<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            
-            timeline_entry = f"- **{timestamp}** - {status_icon} Security Check - {status_text}"
-        
-        elif stage == 'success':
-            status_line = "<h2>🚀 Deployment Status: Successfully Deployed 🟢</h2>"
-            status_icon = "🟢"
-            status_text = "Live and accessible"
-            next_step = "**Status:** Deployment complete - site is ready for testing"
-            actions = f"""<h3>🌐 Preview URLs</h3>
-
-<a href="{branch_url}"><img src="https://img.shields.io/badge/Open_Branch_Preview-brightgreen?style=for-the-badge&logo=github&label=%F0%9F%8C%90&labelColor=gray" alt="Open Branch Preview"/></a>
-
-<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            timeline_entry = f"- **{timestamp}** - 🟢 {step_link} - Site is live"
-        
-        elif stage == 'failure':
-            error_message = self.sanitize_string(data.get('error_message', 'Unknown error'), max_length=200)
-            status_line = "<h2>🚀 Deployment Status: Failed 🔴</h2>"
-            status_icon = "🔴"
-            status_text = "Deployment failed"
-            next_step = "**Action Required:** Fix issues and retry deployment"
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Error_Logs-red?style=for-the-badge&logo=github&label=📊&labelColor=gray" alt="Error Logs"/></a>
-
-**Error:** {error_message}"""
-            timeline_entry = f"- **{timestamp}** - 🔴 {step_link} - Failed: {error_message}"
-        
-        elif stage == 'rate-limit-waiting':
-            wait_info = self.sanitize_string(data.get('error_message', 'Waiting for rate limit to reset'), max_length=300)
-            remaining_minutes = self.sanitize_string(data.get('remaining_minutes', 'unknown'), max_length=10)
-            status_line = "<h2>⏳ Copilot Rate Limit Handler: Waiting 🟡</h2>"
-            status_icon = "🟡"
-            status_text = "Waiting for rate limit to reset"
-            next_step = f"**Status:** {wait_info}"
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Handler_Logs-orange?style=for-the-badge&logo=github&label=⏳&labelColor=gray" alt="Handler Logs"/></a>
-
-**Info:** Copilot rate limit detected. Automatically waiting and will retry when ready.
-**Remaining time:** {remaining_minutes} minutes"""
-            timeline_entry = f"- **{timestamp}** - 🟡 Waiting for rate limit - {remaining_minutes} minutes remaining"
-        
-        elif stage == 'rate-limit-complete':
-            status_line = "<h2>✅ Copilot Rate Limit Handler: Complete 🟢</h2>"
-            status_icon = "🟢"
-            status_text = "Wait complete, triggering Copilot retry"
-            next_step = "**Status:** Done waiting! Copilot retry command posted."
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Handler_Logs-brightgreen?style=for-the-badge&logo=github&label=✅&labelColor=gray" alt="Handler Logs"/></a>
-
-**Result:** Rate limit wait completed successfully. Copilot has been triggered to retry."""
-            timeline_entry = f"- **{timestamp}** - 🟢 Rate limit handler complete - Copilot retry triggered"
+        spec, fields = self.stage_fields(stage, data, workflow_url, branch_url, step_link)
+        status_icon = fields['status_icon']
+        status_text = fields['status_text']
         
-        else:
-            # Fallback (should not reach here due to validation)
-            status_line = "<h2>🚀 Deployment Status: In Progress</h2>"
-            status_icon = "🔵"
-            status_text = "Processing"
-            next_step = "**Status:** Processing deployment"
-            actions = f"""<h3>🔗 Quick Actions</h3>
-
-<a href="{workflow_url}"><img src="https://img.shields.io/badge/Build_Logs-gray?style=for-the-badge&logo=github" alt="Build Logs"/></a>"""
-            timeline_entry = f"- **{timestamp}** - 🔵 Processing"
-        
-        # Build timeline section
-        timeline_section = "### 📋 Deployment Timeline\n\n"
-        if existing_timeline:
-            # Extract just the timeline entries from existing timeline
-            timeline_lines = [line for line in existing_timeline.split('\n') if line.strip().startswith('-')]
-            timeline_section += '\n'.join(timeline_lines) + '\n'
-        timeline_section += timeline_entry + '\n'
-        
-        # Build complete comment with action-specific marker
-        comment = f"""{self.comment_marker}
-{status_line}
-
-{preamble}
-
-{actions}
-
----
-
-<h3>📊 Overall Progress</h3>
-
-**Branch:** [`{branch_name}`]({branch_url})  
-**Status:** {status_icon} {status_text}  
-{next_step}
-"""
+        status_line = spec.status_line.format_map(fields)
+        next_step = spec.next_step.format_map(fields)
+        actions_parts = [spec.actions.format_map(fields)]
+        # Add preview URL if available (determined after PUBLIC_URL calculation)
+        if spec.preview and branch_url:
+            actions_parts.append(spec.preview.format_map(fields))
+        actions = ''.join(actions_parts)
+        icon, _, text = spec.timeline.format_map(fields).partition(' ')
+        timeline.append([timestamp, icon, text])
         
-        comment += f"""
----
-
-{timeline_section}
----
-
-💡 *This comment is automatically updated as the deployment progresses.*
-"""
+        # Build complete comment with action-specific marker, collecting the
+        # fragments in a list and joining once
+        timeline_data = (json.dumps(timeline, ensure_ascii=False, separators=(',', ':'))
+                         .replace('<', '\\u003c').replace('>', '\\u003e'))
+        parts = [
+            self.comment_marker, "\n",
+            _TIMELINE_DATA_PREFIX, timeline_data, " -->\n",
+            status_line, "\n\n",
+            preamble, "\n\n",
+            actions, "\n\n---\n\n",
+            "<h3>📊 Overall Progress</h3>\n\n",
+            f"**Branch:** [`{branch_name}`]({branch_url})  \n",
+            f"**Status:** {status_icon} {status_text}  \n",
+            next_step, "\n\n---\n\n",
+            "### 📋 Deployment Timeline\n\n",
+        ]
+        parts.append('\n'.join([
+            f"- **{timestamp}** - {icon} {text}" if timestamp is not None else text
+            for timestamp, icon, text in timeline
+        ]))
+        parts.append(_FOOTER)
+        comment = ''.join(parts)
         
-        # Validation: Ensure marker is at the very start (CRITICAL for comment updates to work)
-        # This is critical for get_existing_comment() to find and update existing comments
-        if not comment.startswith(self.comment_marker):
-            raise RuntimeError(
-                f"CRITICAL ERROR: Comment marker is not at the start of comment body. "
-                f"This will cause duplicate comments. Marker: {self.comment_marker}, "
-                f"Comment starts with: {comment[:100]}"
-            )
+        # The marker is the first fragment above, so this can only fail if that
+        # changes; get_existing_comment() relies on it to find the comment again
+        # (checked in development and by verify-comment-marker.py, skipped under -O)
+        assert comment.startswith(self.comment_marker), (
+            f"Comment marker is not at the start of comment body. Marker: {self.comment_marker}, "
+            f"Comment starts with: {comment[:100]}"
+        )
         
         return comment
     
@@ -600,6 +859,9 @@ class PRCommentManager:
         """
         Update or create the PR comment for the given stage.
         
+        Stages recorded earlier with append_pending_stage() are published in
+        the same request.
+        
         Args:
             stage: Current workflow stage
             data: Stage-specific data
@@ -607,69 +869,91 @@ class PRCommentManager:
         Returns:
             True if successful, False otherwise
         """
+        return self._publish(stage, data, [p['entry'] for p in self.load_pending_stages()])
+    
+    def flush_pending_stages(self) -> bool:
+        """
+        Publish the recorded stages, the last one as the current stage.
+        
+        Returns:
+            True if successful or nothing was recorded, False otherwise
+        """
+        pending = self.load_pending_stages()
+        if not pending:
+            logger.info("No recorded stages to publish for PR #%s", self.pr_number)
+            return True
+        last = pending[-1]
+        return self._publish(last['stage'], last['data'], [p['entry'] for p in pending[:-1]],
+                             timestamp=last['entry'][0])
+    
+    def _publish(self, stage: str, data: Dict[str, Any], pending: List[TimelineEntry],
+                 timestamp: Optional[str] = None) -> bool:
+        """Update or create the comment; see update_comment()."""
         try:
             # Validate stage
             stage = self.validate_stage(stage)
             
-            # Check for existing comment and extract timeline
-            existing = self.get_existing_comment()
-            existing_timeline = ""
+            # An earlier stage of this run may have recorded the comment already
+            if self._existing_comment is None:
+                self.load_cached_comment()
+            
+            # Check for existing comment (and, on the first stage, for a duplicate
+            # from another workflow run) and extract timeline. Later stages
+            # never skip on a duplicate, so they don't look for one.
+            if stage == 'started':
+                existing, duplicate = self.find_existing_and_duplicate_comment()
+            else:
+                existing = self.get_existing_comment()
+                duplicate = None
+            existing_timeline = []
             if existing:
-                print(f"Found existing comment with ID {existing['id']}")
-                existing_timeline = self.extract_timeline_from_comment(existing.get('body', ''))
+                logger.debug("Found existing comment with ID %s", existing['id'])
+                existing_timeline = self.extract_timeline_entries(existing.get('body') or '')
                 if existing_timeline:
-                    # Count existing timeline entries
-                    entry_count = len([line for line in existing_timeline.split('\n') if line.strip().startswith('-')])
-                    print(f"Extracted {entry_count} existing timeline entries")
+                    logger.debug("Extracted %d existing timeline entries", len(existing_timeline))
                 else:
-                    print("No existing timeline found in comment")
+                    logger.debug("No existing timeline found in comment")
             else:
-                print(f"No existing comment found for action_id: {self.action_id if self.action_id else 'N/A'}")
+                logger.info("No existing comment found for action_id: %s", self.action_id or 'N/A')
                 
                 # Check if there's a duplicate comment for the same commit from another workflow
-                duplicate = self.check_duplicate_comment_for_commit()
-                if duplicate and stage == 'started':
-                    # Only skip on the first stage to avoid issues
-                    print(f"⚠️  Skipping comment creation - duplicate already exists for commit {self.commit_sha[:7]}")
-                    print(f"    Existing comment ID: {duplicate['id']}")
-                    print(f"    This workflow ({self.workflow_name}, event: {self.event_name}) will not create a duplicate comment.")
+                if duplicate:
+                    # Only found on the first stage, so later stages still post
+                    logger.info("⚠️  Skipping comment creation - duplicate already exists for commit %s", self.commit_sha[:7])
+                    logger.info("    Existing comment ID: %s", duplicate['id'])
+                    logger.info("    This workflow (%s, event: %s) will not create a duplicate comment.",
+                                self.workflow_name, self.event_name)
                     return True  # Return success to avoid error, but don't create duplicate
             
             # Build comment body with existing timeline
-            comment_body = self.build_comment_body(stage, data, existing_timeline)
+            comment_body = self.build_comment_body(stage, data, existing_timeline, pending, timestamp)
             
-            # Debug: Log marker placement verification
-            marker_at_start = comment_body.startswith(self.comment_marker)
-            print(f"📋 Comment body generated (marker at start: {marker_at_start}, length: {len(comment_body)} chars)")
-            if not marker_at_start:
-                print(f"⚠️  WARNING: Marker not at start! First 100 chars: {comment_body[:100]}")
+            logger.debug("📋 Comment body generated (%d chars)", len(comment_body))
+            
+            try:
+                self.upsert_comment(comment_body, existing)
+            except GitHubAPIError as e:
+                if e.status_code != 404 or not self._comment_from_cache:
+                    raise
+                # The cached comment has been deleted; find or create it afresh
+                logger.warning("⚠️  Cached comment %s no longer exists, searching PR comments", existing['id'])
+                self.forget_cached_comment()
+                return self._publish(stage, data, pending, timestamp)
+            self._comment_from_cache = False
+            self.save_cached_comment()
+            self.clear_pending_stages()
             
             if existing:
-                # Update existing comment
-                url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/comments/{existing['id']}"
-                payload = {"body": comment_body}
-                
-                response = requests.patch(url, headers=self.headers, json=payload, timeout=30)
-                response.raise_for_status()
-                
-                print(f"✅ Updated PR #{self.pr_number} comment (stage: {stage})")
-                return True
+                logger.info("✅ Updated PR #%s comment (stage: %s)", self.pr_number, stage)
             else:
-                # Create new comment
-                url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
-                payload = {"body": comment_body}
+                logger.info("✅ Created PR #%s comment (stage: %s)", self.pr_number, stage)
+            return True
                 
-                response = requests.post(url, headers=self.headers, json=payload, timeout=30)
-                response.raise_for_status()
-                
-                print(f"✅ Created PR #{self.pr_number} comment (stage: {stage})")
-                return True
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Error updating comment: {e}", file=sys.stderr)
+        except GitHubAPIError as e:
+            logger.error("❌ Error updating comment: %s", e)
             return False
         except Exception as e:
-            print(f"❌ Unexpected error: {e}", file=sys.stderr)
+            logger.error("❌ Unexpected error: %s", e)
             return False
 
 
@@ -688,6 +972,18 @@ Examples:
   python manage-pr-comment.py --token $TOKEN --repo owner/repo --pr 123 \\
       --action-id ${{ github.run_id }} \\
       --stage success --data '{"commit_sha": "abc123", "branch_name": "feature", "commit_url": "...", "workflow_url": "...", "branch_url": "..."}'
+  
+  # Apply several stage updates in one run (one process and one connection)
+  python manage-pr-comment.py --token $TOKEN --repo owner/repo --pr 123 \\
+      --action-id ${{ github.run_id }} --batch-file updates.json
+  # where updates.json is [{"stage": "started", "data": {...}}, {"stage": "setup", "data": {...}}]
+  
+  # Record a short-lived stage without contacting GitHub; the next update of
+  # the same run (or --flush) publishes it along with its own stage
+  python manage-pr-comment.py --token $TOKEN --repo owner/repo --pr 123 \\
+      --action-id ${{ github.run_id }} --append-only --stage setup --data '{...}'
+  python manage-pr-comment.py --token $TOKEN --repo owner/repo --pr 123 \\
+      --action-id ${{ github.run_id }} --flush
 
 Workflow Interaction:
   When a PR is created or updated, two workflows may run:
@@ -709,25 +1005,59 @@ Workflow Interaction:
     parser.add_argument('--commit-sha', help='Commit SHA to check for duplicate comments')
     parser.add_argument('--workflow-name', help='Name of the workflow (for display)')
     parser.add_argument('--event-name', help='Event that triggered the workflow (e.g., push, pull_request)')
-    parser.add_argument('--stage', required=True, 
-                       choices=list(PRCommentManager.ALLOWED_STAGES),
-                       help='Current workflow stage')
-    parser.add_argument('--data', required=True, help='JSON data for the stage')
+    parser.add_argument('--stage', 
+                       choices=sorted(PRCommentManager.ALLOWED_STAGES),
+                       help='Current workflow stage (required unless --batch-file is given)')
+    parser.add_argument('--data', help='JSON data for the stage (required unless --batch-file is given)')
+    parser.add_argument('--batch-file',
+                       help='JSON file with a list of {"stage": ..., "data": {...}} updates to apply in order')
+    parser.add_argument('--append-only', action='store_true',
+                       help='Record the update(s) in $RUNNER_TEMP for the next update of this run instead '
+                            'of posting them (requires --action-id)')
+    parser.add_argument('--flush', action='store_true',
+                       help='Post the updates recorded with --append-only, if any (requires --action-id)')
+    parser.add_argument('--verbose', action='store_true', help='Also log lookup and timeline diagnostics')
     
     args = parser.parse_args()
+    configure_logging(args.verbose)
     
-    # Parse JSON data
-    try:
-        data = json.loads(args.data)
-    except json.JSONDecodeError as e:
-        print(f"Error: Invalid JSON data: {e}", file=sys.stderr)
-        sys.exit(1)
+    if (args.append_only or args.flush) and not args.action_id:
+        parser.error('--append-only and --flush require --action-id')
+    if args.flush:
+        if args.append_only or args.stage or args.batch_file:
+            parser.error('--flush takes no updates of its own')
+        updates = []
+    elif args.batch_file:
+        # Parse the list of stage updates
+        try:
+            with open(args.batch_file, 'rb') as f:
+                updates = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read batch file {args.batch_file}: {e}", file=sys.stderr)
+            sys.exit(1)
+        if (not isinstance(updates, list) or not updates
+                or not all(isinstance(u, dict) and isinstance(u.get('stage'), str)
+                           and isinstance(u.get('data', {}), dict) for u in updates)):
+            print('Error: Batch file must be a non-empty JSON list of {"stage": ..., "data": {...}} objects',
+                  file=sys.stderr)
+            sys.exit(1)
+        updates = [(u['stage'], u.get('data', {})) for u in updates]
+    elif args.stage and args.data is not None:
+        # Parse JSON data
+        try:
+            data = json.loads(args.data)
+        except json.JSONDecodeError as e:
+            print(f"Error: Invalid JSON data: {e}", file=sys.stderr)
+            sys.exit(1)
+        updates = [(args.stage, data)]
+    else:
+        parser.error('--stage and --data are required unless --batch-file or --flush is given')
     
     # Extract commit SHA from data if not provided as argument
-    commit_sha = args.commit_sha or data.get('commit_sha')
+    commit_sha = args.commit_sha or (updates[0][1].get('commit_sha') if updates else None)
     
     # Create manager and update comment
-    manager = PRCommentManager(
+    with PRCommentManager(
         args.token, 
         args.repo, 
         args.pr, 
@@ -735,8 +1065,16 @@ Workflow Interaction:
         commit_sha=commit_sha,
         workflow_name=args.workflow_name,
         event_name=args.event_name
-    )
-    success = manager.update_comment(args.stage, data)
+    ) as manager:
+        if args.flush:
+            results = [manager.flush_pending_stages()]
+        elif args.append_only:
+            results = [manager.append_pending_stage(stage, data) for stage, data in updates]
+        else:
+            # Later updates reuse the connection and the comment found or
+            # created by the first one
+            results = [manager.update_comment(stage, data) for stage, data in updates]
+    success = all(results)
     
     sys.exit(0 if success else 1)
 
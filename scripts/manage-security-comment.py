@@ -7,69 +7,66 @@ integrating with the run-security-checks.js and format-security-comment.js scrip
 """
 
 import argparse
-import json
-import os
 import sys
+from pathlib import Path
 from typing import Dict, Optional, Any
 
-try:
-    import requests
-except ImportError:
-    print("Error: requests library not found. Install with: pip install requests", file=sys.stderr)
-    sys.exit(1)
+from gh_comment_common import CommentManagerBase, GitHubAPIError
 
+# GitHub rejects comment bodies longer than this with 422 Unprocessable Entity
+MAX_COMMENT_LENGTH = 65536
+# Appended to a report that had to be shortened to fit
+TRUNCATION_NOTE = "\n\n_(Report truncated to fit GitHub's comment size limit; see the workflow logs for the full output.)_"
 
-class SecurityCheckCommentManager:
+
+class SecurityCheckCommentManager(CommentManagerBase):
     """Manages security check comments on PRs."""
     
     COMMENT_MARKER = "<!-- sgex-security-check-comment -->"
+    # Marker text without the HTML comment delimiters, used to skip comment
+    # pages that can't contain it (see iter_comments)
+    MARKER_NEEDLE = "sgex-security-check-comment"
     
-    def __init__(self, token: str, repo: str, pr_number: int):
+    def get_existing_comment(self) -> Optional[Dict[str, Any]]:
         """
-        Initialize the security check comment manager.
+        Find existing security check comment on the PR.
         
-        Args:
-            token: GitHub token for authentication
-            repo: Repository in format 'owner/repo'
-            pr_number: Pull request number
-        """
-        self.token = token
-        self.owner, self.repo_name = repo.split('/')
-        self.pr_number = pr_number
-        self.api_base = "https://api.github.com"
-        self.headers = {
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json",
-            "Content-Type": "application/json"
-        }
-    
-    def get_existing_comment(self) -> Optional[Dict[str, Any]]:
-        """Find existing security check comment on the PR."""
-        url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
+        The result is remembered, so later lookups by this instance don't
+        list comments again.
         
-        try:
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
+        Returns:
+            Comment dict if found, None otherwise
             
-            comments = response.json()
-            for comment in comments:
-                if self.COMMENT_MARKER in comment.get('body', ''):
-                    return comment
-            
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching comments: {e}", file=sys.stderr)
+        Raises:
+            GitHubAPIError: If the comments can't be listed; treating that as
+                            "not found" would post a second comment
+        """
+        if self._existing_comment is not None:
+            return self._existing_comment
+        if self._comment_missing:
             return None
+        
+        for comment in self.iter_comments(needle=self.MARKER_NEEDLE):
+            # The marker is always the start of the comment (see create_comment_body)
+            if (comment.get('body') or '').startswith(self.COMMENT_MARKER):
+                self._existing_comment = comment
+                return comment
+        
+        self._comment_missing = True
+        return None
     
     def create_comment_body(self, security_comment: str) -> str:
-        """Create the full comment body with marker."""
-        return f"""{self.COMMENT_MARKER}
-{security_comment}
+        """Create the full comment body with marker, shortening the report to fit GitHub's limit."""
+        footer = """
 
 ---
 
 *This security check is automatically run on every PR build. [Learn more about our security checks](../blob/main/docs/security.md)*
 """
+        room = MAX_COMMENT_LENGTH - len(self.COMMENT_MARKER) - 1 - len(footer)
+        if len(security_comment) > room:
+            security_comment = security_comment[:room - len(TRUNCATION_NOTE)] + TRUNCATION_NOTE
+        return f"{self.COMMENT_MARKER}\n{security_comment}{footer}"
     
     def update_or_create_comment(self, security_comment: str) -> bool:
         """Update existing comment or create new one."""
@@ -77,28 +74,14 @@ class SecurityCheckCommentManager:
             comment_body = self.create_comment_body(security_comment)
             existing = self.get_existing_comment()
             
+            self.upsert_comment(comment_body, existing)
             if existing:
-                # Update existing comment
-                url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/comments/{existing['id']}"
-                payload = {"body": comment_body}
-                
-                response = requests.patch(url, headers=self.headers, json=payload, timeout=30)
-                response.raise_for_status()
-                
                 print(f"✅ Updated security check comment on PR #{self.pr_number}")
-                return True
             else:
-                # Create new comment
-                url = f"{self.api_base}/repos/{self.owner}/{self.repo_name}/issues/{self.pr_number}/comments"
-                payload = {"body": comment_body}
-                
-                response = requests.post(url, headers=self.headers, json=payload, timeout=30)
-                response.raise_for_status()
-                
                 print(f"✅ Created security check comment on PR #{self.pr_number}")
-                return True
+            return True
                 
-        except requests.exceptions.RequestException as e:
+        except GitHubAPIError as e:
             print(f"Error updating comment: {e}", file=sys.stderr)
             return False
 
@@ -115,22 +98,21 @@ def main():
     args = parser.parse_args()
     
     # Read the formatted security comment
-    if not os.path.exists(args.comment_file):
+    try:
+        security_comment = Path(args.comment_file).read_text(encoding='utf-8', errors='replace')
+    except FileNotFoundError:
         print(f"Error: Comment file not found: {args.comment_file}", file=sys.stderr)
         print("Run run-security-checks.js and format-security-comment.js first.", file=sys.stderr)
         sys.exit(1)
     
-    with open(args.comment_file, 'r') as f:
-        security_comment = f.read()
-    
     # Create manager and update comment
-    manager = SecurityCheckCommentManager(
+    with SecurityCheckCommentManager(
         token=args.token,
         repo=args.repo,
         pr_number=args.pr
-    )
+    ) as manager:
+        success = manager.update_or_create_comment(security_comment)
     
-    success = manager.update_or_create_comment(security_comment)
     sys.exit(0 if success else 1)
 
 
@@ -9,22 +9,34 @@ without actually running the GitHub Actions workflow.
 import re
 import sys
 
+# Rate limit patterns from the workflow
+RATE_LIMIT_PATTERNS = [
+    'rate limit',
+    'rate-limit',
+    'too many requests',
+    'retry after',
+    'exceeded.*quota',
+    'api rate limit exceeded',
+    '429',
+    'requests per'
+]
+
+# All patterns as one alternation, so a comment is scanned once; IGNORECASE
+# matches the workflow's RegExp 'i' flag
+RATE_LIMIT_RE = re.compile('|'.join(RATE_LIMIT_PATTERNS), re.IGNORECASE)
+
+# Wait time from the workflow: "retry after 30 minutes", "wait 2 hours",
+# "90 seconds before" or a time at the end, in one scan; the earliest mention wins
+WAIT_TIME_RE = re.compile(
+    r'(?:retry\s+after|wait)\s+(?P<n>\d+)\s*(?P<u>minute|hour|second)'
+    r'|(?P<n2>\d+)\s*(?P<u2>hour|minute|second)s?(?:\s+before|$)',
+    re.IGNORECASE
+)
+
 
 def test_rate_limit_detection():
     """Test rate limit error pattern detection."""
     
-    # Rate limit patterns from the workflow
-    rate_limit_patterns = [
-        'rate limit',
-        'rate-limit',
-        'too many requests',
-        'retry after',
-        'exceeded.*quota',
-        'api rate limit exceeded',
-        '429',
-        'requests per'
-    ]
-    
     # Test cases
     test_cases = [
         # Should match
@@ -46,11 +58,7 @@ def test_rate_limit_detection():
     print("Testing rate limit detection patterns...\n")
     
     for comment_body, should_match in test_cases:
-        comment_lower = comment_body.lower()
-        has_rate_limit_error = any(
-            re.search(pattern, comment_lower) 
-            for pattern in rate_limit_patterns
-        )
+        has_rate_limit_error = bool(RATE_LIMIT_RE.search(comment_body))
         
         if has_rate_limit_error == should_match:
             print(f"✅ PASS: '{comment_body[:50]}...'")
@@ -85,19 +93,13 @@ def test_wait_time_extraction():
     print("Testing wait time extraction...\n")
     
     for comment_body, expected_minutes in test_cases:
-        comment_lower = comment_body.lower()
-        
-        # Wait time extraction logic matching the workflow
-        retry_after_match = re.search(r'retry\s+after\s+(\d+)\s*(minute|hour|second)', comment_lower, re.IGNORECASE)
-        wait_match = re.search(r'wait\s+(\d+)\s*(minute|hour|second)', comment_lower, re.IGNORECASE)
-        time_match = re.search(r'(\d+)\s*(hour|minute|second)s?\s+before', comment_lower, re.IGNORECASE) or \
-                     re.search(r'(\d+)\s*(hour|minute|second)s?$', comment_lower, re.IGNORECASE)
-        
-        match = retry_after_match or wait_match or time_match
+        # Wait time extraction logic matching the workflow; WAIT_TIME_RE
+        # ignores case itself
+        match = WAIT_TIME_RE.search(comment_body)
         
         if match:
-            time = int(match.group(1))
-            unit = match.group(2).lower()
+            time = int(match.group('n') or match.group('n2'))
+            unit = (match.group('u') or match.group('u2')).lower()
             
             if 'hour' in unit:
                 wait_minutes = time * 60
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Test script for PR comment updates made by manage-pr-comment.py across runs
+
+Each workflow step runs the script anew, so these tests use a new manager per
+run, sharing one $RUNNER_TEMP, against an in-memory stand-in for the GitHub
+issue comments API:
+1. A comment added on a new page is still found when page 1 is unchanged
+   and revalidates with 304 Not Modified
+2. A stage recorded with --append-only is published, and its pending file
+   removed, by the next stage update
+
+Runs offline; no GitHub credentials are needed.
+"""
+
+import sys
+import os
+import json
+import tempfile
+from urllib.parse import urlparse, parse_qs
+
+# Caches shared between the runs below go to a fresh directory
+os.environ['RUNNER_TEMP'] = tempfile.mkdtemp(prefix='sgex-test-')
+
+# Add the scripts directory to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+# Import the module by loading it directly
+import importlib.util
+spec = importlib.util.spec_from_file_location(
+    "manage_pr_comment",
+    os.path.join(script_dir, "manage-pr-comment.py")
+)
+manage_pr_comment = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(manage_pr_comment)
+
+import gh_comment_common
+from gh_comment_common import load_requests
+
+PRCommentManager = manage_pr_comment.PRCommentManager
+
+# ANSI color codes
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+COMMIT_DATA = {
+    'commit_sha': 'abc1234567890def',
+    'branch_name': 'feature/test-branch',
+    'commit_url': 'https://github.com/owner/repo/commit/abc1234567890def',
+    'workflow_url': 'https://github.com/owner/repo/actions/runs/12345',
+}
+
+
+class FakeResponse:
+    """The parts of requests.Response the comment managers use"""
+
+    def __init__(self, status_code, payload=None, headers=None, links=None):
+        self.status_code = status_code
+        self.content = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.headers = headers or {}
+        self.links = links or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise load_requests().exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeGitHub:
+    """Issue comments API for one PR: paged listing with ETags, create and update"""
+
+    def __init__(self, comment_count=0):
+        self.comments = [{'id': i, 'body': f'Comment {i}'} for i in range(1, comment_count + 1)]
+        self.next_id = 10001
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        per_page = int(query['per_page'][0])
+        page = int(query.get('page', ['1'])[0])
+        comments = self.comments[(page - 1) * per_page:page * per_page]
+        last = max(1, -(-len(self.comments) // per_page))
+
+        base = f"https://api.github.com{parsed.path}?per_page={per_page}"
+        links = {}
+        if page < last:
+            links['next'] = {'url': f"{base}&page={page + 1}", 'rel': 'next'}
+            links['last'] = {'url': f"{base}&page={last}", 'rel': 'last'}
+        if page > 1:
+            links['prev'] = {'url': f"{base}&page={page - 1}", 'rel': 'prev'}
+            links['first'] = {'url': f"{base}&page=1", 'rel': 'first'}
+        response_headers = {'ETag': f'"{hash(json.dumps(comments))}"'}
+        if links:
+            response_headers['Link'] = ', '.join(f'<{l["url"]}>; rel="{rel}"' for rel, l in links.items())
+
+        if (headers or {}).get('If-None-Match') == response_headers['ETag']:
+            self.requests.append(('GET', page, 304))
+            return FakeResponse(304, headers=response_headers, links=links)
+        self.requests.append(('GET', page, 200))
+        return FakeResponse(200, comments, response_headers, links)
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        comment = {'id': self.next_id, 'body': json.loads(data)['body']}
+        self.next_id += 1
+        self.comments.append(comment)
+        self.requests.append(('POST', comment['id'], 201))
+        return FakeResponse(201, comment)
+
+    def patch(self, url, headers=None, data=None, timeout=None):
+        comment_id = int(url.rsplit('/', 1)[1])
+        for comment in self.comments:
+            if comment['id'] == comment_id:
+                comment['body'] = json.loads(data)['body']
+                self.requests.append(('PATCH', comment_id, 200))
+                return FakeResponse(200, comment)
+        self.requests.append(('PATCH', comment_id, 404))
+        return FakeResponse(404, {'message': 'Not Found'})
+
+    def close(self):
+        """Called when a script run closes the shared session; nothing to release"""
+
+    def managed_comment_ids(self):
+        return [c['id'] for c in self.comments if c['body'].startswith('<!-- sgex-deployment-status-comment')]
+
+
+def run_update(api, stage, action_id=None):
+    """One script run: a new manager updating the comment for a stage"""
+    manager = PRCommentManager("test-token", "owner/repo", 123, action_id)
+    manager.session = api
+    return manager.update_comment(stage, COMMIT_DATA)
+
+
+def run_script(api, *args):
+    """One script run through the command line, with the shared session replaced by api"""
+    gh_comment_common._SESSION = api
+    sys.argv = ["manage-pr-comment.py", "--token", "test-token", "--repo", "owner/repo", "--pr", "123",
+                "--data", json.dumps(COMMIT_DATA), *args]
+    try:
+        manage_pr_comment.main()
+    except SystemExit as e:
+        return e.code == 0
+    return False
+
+
+def check(label, condition, detail=""):
+    """Report one check"""
+    if condition:
+        print(f"{GREEN}✓ PASS{RESET}: {label}")
+    else:
+        print(f"{RED}✗ FAIL{RESET}: {label} {detail}")
+    return condition
+
+
+def test_new_page_after_304():
+    """Test that a comment pushed onto page 2 is found when page 1 revalidates as unchanged"""
+    # 100 comments fill page 1 exactly; the managed comment starts page 2
+    api = FakeGitHub(comment_count=100)
+    results = [run_update(api, stage) for stage in ('started', 'setup', 'building')]
+
+    all_passed = check("every run succeeds", all(results), results)
+    all_passed &= check("page 1 revalidated with 304", ('GET', 1, 304) in api.requests, api.requests)
+    all_passed &= check("one managed comment", api.managed_comment_ids() == [10001], api.managed_comment_ids())
+    all_passed &= check("later runs update it", [r for r in api.requests if r[0] != 'GET'] ==
+                        [('POST', 10001, 201), ('PATCH', 10001, 200), ('PATCH', 10001, 200)], api.requests)
+    return all_passed
+
+
+def test_append_only_then_next_stage():
+    """Test that --append-only records a stage locally and the next update publishes it"""
+    api = FakeGitHub()
+    action_id = "run-42"
+    pending_path = PRCommentManager("test-token", "owner/repo", 123, action_id).pending_path
+    all_passed = check("started posted", run_update(api, 'started', action_id))
+    requests_before = len(api.requests)
+
+    all_passed &= check("setup recorded", run_script(api, "--action-id", action_id, "--append-only", "--stage", "setup"))
+    all_passed &= check("no request for the recorded stage", len(api.requests) == requests_before,
+                        api.requests[requests_before:])
+    all_passed &= check("pending file written", pending_path.exists())
+
+    all_passed &= check("building posted", run_script(api, "--action-id", action_id, "--stage", "building"))
+    all_passed &= check("one PATCH for both stages", [r for r in api.requests[requests_before:] if r[0] != 'GET'] ==
+                        [('PATCH', 10001, 200)], api.requests[requests_before:])
+    timeline = api.comments[0]['body'].split("### 📋 Deployment Timeline")[1]
+    all_passed &= check("setup entry completed", "🟢 [Environment Setup Complete]" in timeline, timeline)
+    all_passed &= check("building entry in progress", "🟠 [Building Application]" in timeline, timeline)
+    all_passed &= check("pending file removed", not pending_path.exists())
+    return all_passed
+
+
+def run_tests():
+    """Run all tests"""
+    print("🧪 Testing manage-pr-comment.py updates across runs\n")
+    print("=" * 60)
+
+    tests = [
+        ("New page behind an unchanged page 1", test_new_page_after_304),
+        ("Append-only stage published by the next update", test_append_only_then_next_stage),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for name, test_func in tests:
+        print(f"\nTest: {name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"{RED}✗ FAIL{RESET}: Unexpected exception: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print("\n📊 Test Results:")
+    print(f"   {GREEN}Passed: {passed}{RESET}")
+    print(f"   {RED}Failed: {failed}{RESET}")
+    print(f"   Total: {passed + failed}")
+
+    if failed == 0:
+        print(f"\n{GREEN}✓ All tests passed!{RESET}\n")
+        return 0
+    else:
+        print(f"\n{RED}✗ Some tests failed{RESET}\n")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(run_tests())
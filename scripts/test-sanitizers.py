@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the input sanitizers used by manage-pr-comment.py
+
+Locks in the behavior of the precompiled patterns and translation table:
+1. sanitize_string strips control characters (keeping newlines and tabs),
+   escapes backticks and applies the length limit before escaping
+2. sanitize_url only accepts https links to GitHub and GitHub Pages
+3. action IDs are reduced to [a-zA-Z0-9-_] and 50 characters in the marker
+
+Runs offline; no GitHub credentials are needed.
+"""
+
+import sys
+import os
+
+# Add the scripts directory to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+# Import the module by loading it directly
+import importlib.util
+spec = importlib.util.spec_from_file_location(
+    "manage_pr_comment",
+    os.path.join(script_dir, "manage-pr-comment.py")
+)
+manage_pr_comment = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(manage_pr_comment)
+
+PRCommentManager = manage_pr_comment.PRCommentManager
+
+# ANSI color codes
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+manager = PRCommentManager(token="test-token", repo="owner/repo", pr_number=123)
+
+
+def check_cases(label, func, cases):
+    """Run func over (input, expected) pairs and report each result"""
+    all_passed = True
+    for value, expected in cases:
+        result = func(value)
+        if result == expected:
+            print(f"{GREEN}✓ PASS{RESET}: {label} {value!r}")
+        else:
+            print(f"{RED}✗ FAIL{RESET}: {label} {value!r} - expected {expected!r}, got {result!r}")
+            all_passed = False
+    return all_passed
+
+
+def test_sanitize_string_control_chars():
+    """Test that control characters are removed but newlines and tabs kept"""
+    return check_cases("sanitize_string", manager.sanitize_string, [
+        ("plain text", "plain text"),
+        ("a\x00b\x07c\x1fd\x7fe", "abcde"),
+        ("line1\nline2\tend\r", "line1\nline2\tend\r"),
+        ("\x0b\x0c", ""),
+        ("", ""),
+    ])
+
+
+def test_sanitize_string_backticks():
+    """Test that backticks are escaped"""
+    return check_cases("sanitize_string", manager.sanitize_string, [
+        ("`code`", "\\`code\\`"),
+        ("feat/`x`\x01y", "feat/\\`x\\`y"),
+    ])
+
+
+def test_sanitize_string_length():
+    """Test that the length limit applies before escaping and to non-strings"""
+    return check_cases("sanitize_string(max_length=5)", lambda v: manager.sanitize_string(v, 5), [
+        ("abcdefgh", "abcde"),
+        ("````````", "\\`\\`\\`\\`\\`"),
+        (1234567, "12345"),
+    ])
+
+
+def test_sanitize_url():
+    """Test the GitHub / GitHub Pages URL allow-list"""
+    return check_cases("sanitize_url", manager.sanitize_url, [
+        ("https://github.com/owner/repo", "https://github.com/owner/repo"),
+        ("https://owner-1.github.io/repo/", "https://owner-1.github.io/repo/"),
+        ("http://github.com/owner/repo", ""),
+        ("https://evil.com/github.com/", ""),
+        ("https://github.io/x", ""),
+        ("https://github.com.evil.com/x", ""),
+        ("", ""),
+        (None, ""),
+        (42, ""),
+    ])
+
+
+def test_action_id_marker():
+    """Test that action IDs are normalized before going into the marker"""
+    def marker_for(action_id):
+        return PRCommentManager("test-token", "owner/repo", 123, action_id).comment_marker
+
+    return check_cases("action_id", marker_for, [
+        ("run-123_4", "<!-- sgex-deployment-status-comment:run-123_4 -->"),
+        ("run 1$2 --><script>", "<!-- sgex-deployment-status-comment:run12--script -->"),
+        (98765, "<!-- sgex-deployment-status-comment:98765 -->"),
+        ("x" * 80, f"<!-- sgex-deployment-status-comment:{'x' * 50} -->"),
+        (None, "<!-- sgex-deployment-status-comment -->"),
+    ])
+
+
+def run_tests():
+    """Run all tests"""
+    print("🧪 Testing manage-pr-comment.py sanitizers\n")
+    print("=" * 60)
+
+    tests = [
+        ("Control characters", test_sanitize_string_control_chars),
+        ("Backtick escaping", test_sanitize_string_backticks),
+        ("Length limit", test_sanitize_string_length),
+        ("URL allow-list", test_sanitize_url),
+        ("Action ID in marker", test_action_id_marker),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for name, test_func in tests:
+        print(f"\nTest: {name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"{RED}✗ FAIL{RESET}: Unexpected exception: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print("\n📊 Test Results:")
+    print(f"   {GREEN}Passed: {passed}{RESET}")
+    print(f"   {RED}Failed: {failed}{RESET}")
+    print(f"   Total: {passed + failed}")
+
+    if failed == 0:
+        print(f"\n{GREEN}✓ All tests passed!{RESET}\n")
+        return 0
+    else:
+        print(f"\n{RED}✗ Some tests failed{RESET}\n")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(run_tests())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script for the deployment timeline stored by manage-pr-comment.py
+
+Later stages read the timeline back from the comment written by earlier ones:
+1. Entries written to the <!-- sgex-timeline-data:... --> block are read back
+   unchanged, including '<', '>', ' -->' and line breaks in their text
+2. Comments written before that block existed are read from the rendered
+   markdown timeline
+
+Runs offline; no GitHub credentials are needed.
+"""
+
+import sys
+import os
+
+# Add the scripts directory to path
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, script_dir)
+
+# Import the module by loading it directly
+import importlib.util
+spec = importlib.util.spec_from_file_location(
+    "manage_pr_comment",
+    os.path.join(script_dir, "manage-pr-comment.py")
+)
+manage_pr_comment = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(manage_pr_comment)
+
+PRCommentManager = manage_pr_comment.PRCommentManager
+
+# ANSI color codes
+GREEN = '\033[92m'
+RED = '\033[91m'
+RESET = '\033[0m'
+
+manager = PRCommentManager(token="test-token", repo="owner/repo", pr_number=123, action_id="run-1")
+
+TEST_DATA = {
+    'commit_sha': 'abc1234567890def',
+    'branch_name': 'feature/test-branch',
+    'commit_url': 'https://github.com/owner/repo/commit/abc1234',
+    'workflow_url': 'https://github.com/owner/repo/actions/runs/12345',
+}
+
+# A comment as written before the JSON timeline block was added
+LEGACY_COMMENT = """<!-- sgex-deployment-status-comment:run-1 -->
+<h2>🚀 Deployment Status: Building Application</h2>
+
+**Status:** 🟠 Compiling and bundling application code
+
+---
+
+### 📋 Deployment Timeline
+
+- **2024-01-15 10:00:00 UTC** - 🟢 [Build Started](https://github.com/owner/repo/blob/abc/.github/workflows/branch-deployment.yml#L116) - Initializing
+- **2024-01-15 10:01:00 UTC** - 🟠 Building Application - In progress
+- manually added note
+
+---
+
+💡 *This comment is automatically updated as the deployment progresses.*
+"""
+
+
+def check(label, result, expected):
+    """Report one comparison"""
+    if result == expected:
+        print(f"{GREEN}✓ PASS{RESET}: {label}")
+        return True
+    print(f"{RED}✗ FAIL{RESET}: {label} - expected {expected!r}, got {result!r}")
+    return False
+
+
+def test_json_round_trip():
+    """Test that timeline entries survive being written to a comment and read back"""
+    entries = [
+        ['2024-01-15 10:00:00 UTC', '🟢', 'Build Started - <b>bold</b> --> not the end'],
+        ['2024-01-15 10:01:00 UTC', '🟢', 'first line\nsecond line'],
+        [None, None, '- manually added note'],
+    ]
+    body = manager.build_comment_body('building', TEST_DATA, entries)
+    read_back = manager.extract_timeline_entries(body)
+
+    all_passed = check("earlier entries", read_back[:len(entries)], entries)
+    all_passed &= check("entry count", len(read_back), len(entries) + 1)
+    all_passed &= check("new entry icon", read_back[-1][1], '🟠')
+    all_passed &= check("one data block", body.count(manage_pr_comment._TIMELINE_DATA_PREFIX), 1)
+    all_passed &= check("data block closed once", body.split('\n', 2)[1].count(' -->'), 1)
+
+    # And once more, as the next stage would
+    body = manager.build_comment_body('deploying', TEST_DATA, read_back)
+    read_again = manager.extract_timeline_entries(body)
+    all_passed &= check("second round trip", read_again[:len(entries)], entries)
+    all_passed &= check("previous stage completed", read_again[len(entries)][1], '🟢')
+    return all_passed
+
+
+def test_legacy_markdown():
+    """Test that a comment without the JSON block is read from its rendered timeline"""
+    expected = [
+        ['2024-01-15 10:00:00 UTC', '🟢',
+         '[Build Started](https://github.com/owner/repo/blob/abc/.github/workflows/branch-deployment.yml#L116) - Initializing'],
+        ['2024-01-15 10:01:00 UTC', '🟠', 'Building Application - In progress'],
+        [None, None, '- manually added note'],
+    ]
+    all_passed = check("legacy entries", manager.extract_timeline_entries(LEGACY_COMMENT), expected)
+
+    # Updating a legacy comment carries its entries over into the JSON block
+    body = manager.build_comment_body('deploying', TEST_DATA, manager.extract_timeline_entries(LEGACY_COMMENT))
+    read_back = manager.extract_timeline_entries(body)
+    expected[1][1] = '🟢'  # the stage in progress then is now completed
+    all_passed &= check("carried over", read_back[:3], expected)
+    return all_passed
+
+
+def run_tests():
+    """Run all tests"""
+    print("🧪 Testing manage-pr-comment.py timeline storage\n")
+    print("=" * 60)
+
+    tests = [
+        ("JSON timeline round trip", test_json_round_trip),
+        ("Legacy markdown timeline", test_legacy_markdown),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for name, test_func in tests:
+        print(f"\nTest: {name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"{RED}✗ FAIL{RESET}: Unexpected exception: {e}")
+            failed += 1
+
+    print("\n" + "=" * 60)
+    print("\n📊 Test Results:")
+    print(f"   {GREEN}Passed: {passed}{RESET}")
+    print(f"   {RED}Failed: {failed}{RESET}")
+    print(f"   Total: {passed + failed}")
+
+    if failed == 0:
+        print(f"\n{GREEN}✓ All tests passed!{RESET}\n")
+        return 0
+    else:
+        print(f"\n{RED}✗ Some tests failed{RESET}\n")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(run_tests())
@@ -71,10 +71,21 @@ def verify_all_stages():
         ('success', 'Successfully Deployed', {}),
         ('failure', 'Failed', {'error_message': 'Test error message'}),
         ('pages-built', 'GitHub Pages Built', {}),
+        ('security-check', 'Security Check', {'security_comment_path': os.devnull}),
+        ('rate-limit-waiting', 'Rate Limit Waiting', {'remaining_minutes': '42'}),
+        ('rate-limit-complete', 'Rate Limit Complete', {}),
     ]
     
+    # build_comment_body() only asserts the marker position, which python -O
+    # skips, so every allowed stage must be covered here
+    missing = PRCommentManager.ALLOWED_STAGES - {stage for stage, _, _ in stages}
+    if missing:
+        print(f"❌ FAIL - Stages not verified: {', '.join(sorted(missing))}")
+        print()
+        return 1
+    
     print("-"*70)
-    print(f"{'Stage':<15} {'Description':<30} {'Result':<15}")
+    print(f"{'Stage':<20} {'Description':<30} {'Result':<15}")
     print("-"*70)
     
     all_passed = True
@@ -95,7 +106,7 @@ def verify_all_stages():
                 result = "❌ FAIL"
                 all_passed = False
                 
-            print(f"{stage:<15} {description:<30} {result:<15}")
+            print(f"{stage:<20} {description:<30} {result:<15}")
             
             if not marker_at_start:
                 print(f"  ERROR: Marker not at start!")
@@ -103,7 +114,7 @@ def verify_all_stages():
                 print()
                 
         except Exception as e:
-            print(f"{stage:<15} {description:<30} ❌ ERROR")
+            print(f"{stage:<20} {description:<30} ❌ ERROR")
             print(f"  Exception: {e}")
             print()
             all_passed = False